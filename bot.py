@@ -5,16 +5,24 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 
-from config import TOKEN, CHANNEL_ID, DATABASE_URL
+from config import TOKEN, CHANNEL_ID, DATABASE_URL, SEARCH_BACKEND, SEARCH_PROCESSES, ACCESS_PRELOAD, BROADCAST_WORKER
 from db import init_db
 from db.core import init_pool
+from db.access import load_active_subscribers
+from db.search_sessions import run_search_session_purge
+from middlewares.access import setup_access_middleware
+from service.broadcast_jobs import start_broadcast_worker
+from service.catalog import load_catalog, start_catalog_sync
+from service.procpool import start_search_pool
+from service.search import disable_trgm, trgm_enabled
 from utils.sub_notifier import run_sub_expiry_notifier
+from utils.ttl import DELETIONS
 
 from handlers import admin_broadcast
 from handlers.admin_subs import router as admin_subs_router
 from handlers.admin import router as admin_router
 from handlers.start import router as start_router
-from handlers.access import router as access_router
+from handlers.access import router as access_router, ADMIN_IDS
 from handlers.search import router as search_router
 from handlers.channel import router as channel_router
 
@@ -33,12 +41,25 @@ logger = logging.getLogger(__name__)
 async def main():
     # DB initlar pollingdan oldin
     await init_pool(min_size=1, max_size=10)
-    await init_db()
+    trgm_ok = await init_db(trgm=SEARCH_BACKEND == "pg_trgm")
+    if SEARCH_BACKEND == "pg_trgm" and not trgm_ok:
+        disable_trgm("migration failed")
+    # boshqa processlardagi ingest/o'chirishlar (LISTEN/NOTIFY), keyin katalog
+    await start_catalog_sync()
+    await load_catalog()
+    if ACCESS_PRELOAD:
+        n = await load_active_subscribers()
+        logger.info("Active subscribers preloaded: %d", n)
+    if SEARCH_PROCESSES > 0 and not trgm_enabled():
+        start_search_pool(SEARCH_PROCESSES)
 
 
     bot = Bot(token=TOKEN)
     dp = Dispatcher()
 
+    # access: har update'da bir marta, routingdan oldin
+    setup_access_middleware(dp, admin_ids=ADMIN_IDS)
+
     dp.include_router(admin_router)
     dp.include_router(admin_subs_router)
     dp.include_router(admin_broadcast.router)
@@ -56,12 +77,21 @@ async def main():
         logger.exception(f"Unhandled error (update_id={upd_id})", exc_info=exc)
         return True
 
+    # TTL o'chirishlar: bitta task, DBdagi navbat (restartdan oldingilar ham)
+    DELETIONS.start(bot)
+    # broadcast shardlari DB lease orqali; BROADCAST_WORKER=0 -> faqat alohida
+    # workerlar (scripts/broadcast_worker.py) yuboradi, bu process search'ga qoladi
+    if BROADCAST_WORKER:
+        start_broadcast_worker(bot)
+
     chat = await bot.get_chat(CHANNEL_ID)
     logger.info(f"Bot started. Kanal: {chat.title} ({chat.id})")
 
     asyncio.create_task(
         run_sub_expiry_notifier(bot, admin_url="https://t.me/Mozcyberr", interval_sec=600)
     )
+    # eski search_sessions (SESSION_TTL) tozalash: search yo'lida emas, fon taskda
+    asyncio.create_task(run_search_session_purge(interval_sec=3600))
 
     await dp.start_polling(bot)
 
@@ -7,6 +7,41 @@ CHANNEL_ID = int(os.getenv("CHANNEL_ID", "0"))
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 ADMIN_IDS = os.getenv("ADMIN_IDS","")
+
+# qidiruv kandidatlari: "index" (xotiradagi katalog) yoki "pg_trgm" (Postgres GIN trigram)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "index").strip().lower()
+
+# rapidfuzz.process.cdist workers (-1 = barcha yadrolar)
+SCORE_WORKERS = int(os.getenv("SCORE_WORKERS", "-1"))
+
+# search micro-batching: batch hajmi, kutish (ms) va navbat chuqurligi
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "64"))
+SEARCH_BATCH_WAIT_MS = float(os.getenv("SEARCH_BATCH_WAIT_MS", "5"))
+SEARCH_QUEUE_MAX = int(os.getenv("SEARCH_QUEUE_MAX", "1024"))
+
+# >0 bo'lsa fuzzy search shuncha worker processda (katalog nusxasi bilan) ishlaydi
+SEARCH_PROCESSES = int(os.getenv("SEARCH_PROCESSES", "0"))
+
+# worker process javobini kutish (sekund); oshsa lokal qidiruvga o'tiladi
+SEARCH_PROCESS_TIMEOUT = float(os.getenv("SEARCH_PROCESS_TIMEOUT", "3"))
+
+# (normalize(query), episode) -> natija LRU cache hajmi
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+
+# 1 -> aktiv obunachilar startupda xotiraga olinadi (has_access/count/list SQLsiz)
+ACCESS_PRELOAD = os.getenv("ACCESS_PRELOAD", "0").strip() == "1"
+
+# broadcast: global limit (msg/s, Telegram ~30) va parallel senderlar soni
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "8"))
+
+# broadcast sharding: job audience'i user_id % N bo'yicha shardlarga bo'linadi,
+# shardlar DB orqali (FOR UPDATE SKIP LOCKED) processlarga lease qilinadi.
+# BROADCAST_WORKER=0 -> bu process broadcast yubormaydi (faqat search/handlerlar)
+BROADCAST_SHARDS = int(os.getenv("BROADCAST_SHARDS", "4"))
+BROADCAST_WORKER = os.getenv("BROADCAST_WORKER", "1").strip() == "1"
+BROADCAST_LEASE_SEC = int(os.getenv("BROADCAST_LEASE_SEC", "60"))
+
 if not TOKEN:
     raise RuntimeError("BOT_TOKEN is missing. Set it in .env or environment variables.")
 
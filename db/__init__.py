@@ -9,6 +9,11 @@ from .movies import (
     delete_movie_by_message_id,
     get_movies_limit,
     get_movies_like,
+    get_movies_trgm,
+    MovieEvent,
+    catalog_version,
+    subscribe,
+    unsubscribe,
 )
 
 from .users import upsert_user, ensure_user_exists, count_users
@@ -7,6 +7,7 @@ import asyncpg
 
 from .core import get_pool
 from .users import ensure_user_exists
+from utils.access_cache import ACCESS_CACHE, ACTIVE_SUBS
 
 
 # =========================
@@ -65,7 +66,10 @@ async def grant_access(user_id: int, days: int, admin_id: int) -> bool:
                 now
             )
 
-            return True
+    ACCESS_CACHE.invalidate(user_id)
+    if ACTIVE_SUBS.loaded:
+        ACTIVE_SUBS.set(user_id, expires_at)
+    return True
 # =========================
 # EXTEND ACCESS
 # =========================
@@ -94,28 +98,60 @@ async def extend_access(user_id: int, days: int = 30) -> int:
             new_expires
         )
 
+    ACCESS_CACHE.invalidate(user_id)
+    if ACTIVE_SUBS.loaded:
+        ACTIVE_SUBS.set(user_id, new_expires)
     return new_expires
 
 
 # =========================
 # CHECK ACCESS
 # =========================
-async def has_access(user_id: int) -> bool:
+async def load_active_subscribers() -> int:
+    """ACCESS_PRELOAD rejimi: aktiv obunachilarni xotiraga oladi (startupda)."""
     pool = await get_pool()
     now = int(time.time())
 
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT user_id, expires_at FROM user_access WHERE expires_at > $1",
+            now
+        )
+
+    ACTIVE_SUBS.load((r["user_id"], r["expires_at"]) for r in rows)
+    return len(rows)
+
+
+async def has_access(user_id: int) -> bool:
+    if ACTIVE_SUBS.loaded:
+        return ACTIVE_SUBS.expires_at(user_id) > int(time.time())
+
+    # ✅ aktiv userlar uchun faqat xotira (pool band qilinmaydi)
+    exp = ACCESS_CACHE.get(user_id)
+    if exp is None:
+        exp = await _load_expires_at(user_id)
+        ACCESS_CACHE.put(user_id, exp)
+    return exp > int(time.time())
+
+
+async def _load_expires_at(user_id: int) -> int:
+    pool = await get_pool()
+
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             "SELECT expires_at FROM user_access WHERE user_id=$1",
             user_id
         )
-        return bool(row and int(row["expires_at"]) > now)
+        return int(row["expires_at"]) if row else 0
 
 
 # =========================
 # COUNT
 # =========================
 async def count_active_subs() -> int:
+    if ACTIVE_SUBS.loaded:
+        return ACTIVE_SUBS.count()
+
     pool = await get_pool()
     now = int(time.time())
 
@@ -149,6 +185,9 @@ async def list_active_users(limit: int = 50) -> list[asyncpg.Record]:
 
 
 async def list_active_user_ids() -> list[int]:
+    if ACTIVE_SUBS.loaded:
+        return ACTIVE_SUBS.user_ids()
+
     pool = await get_pool()
     now = int(time.time())
 
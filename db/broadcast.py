@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import time
-from typing import List
+from typing import AsyncIterator, List
 from .core import get_pool
 
 
@@ -39,4 +39,132 @@ async def set_user_blocked(user_id: int) -> None:
         await conn.execute(
             "UPDATE users SET is_blocked = TRUE WHERE user_id=$1",
             user_id
-        )
\ No newline at end of file
+        )
+
+
+async def set_users_blocked(user_ids: List[int]) -> None:
+    """set_user_blocked ning bulk varianti (broadcast paytida buffer flush)."""
+    if not user_ids:
+        return
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "UPDATE users SET is_blocked = TRUE WHERE user_id = ANY($1::bigint[])",
+            [int(x) for x in user_ids]
+        )
+
+
+# =========================
+# AUDIENCE (keyset, user_id bo'yicha tartiblangan)
+# =========================
+AUDIENCES = ("all", "subs", "unsubs")
+
+
+async def list_audience_page(
+    audience: str,
+    *,
+    after: int = 0,
+    limit: int = 500,
+    shards: int = 1,
+    shard: int = 0,
+) -> List[int]:
+    """
+    audience ("all" | "subs" | "unsubs") dan user_id > after bo'lganlar,
+    o'sish tartibida (PK index, OFFSETsiz).
+    shards > 1 bo'lsa faqat user_id % shards = shard bo'lganlar (broadcast shard).
+    """
+    pool = get_pool()
+    now = int(time.time())
+
+    async with pool.acquire() as conn:
+        if audience == "all":
+            rows = await conn.fetch(
+                """
+                SELECT user_id FROM users
+                WHERE is_blocked = FALSE AND user_id > $1
+                AND user_id % $3 = $4
+                ORDER BY user_id
+                LIMIT $2
+                """,
+                int(after), int(limit), int(shards), int(shard)
+            )
+        elif audience == "subs":
+            rows = await conn.fetch(
+                """
+                SELECT user_id FROM user_access
+                WHERE expires_at > $1 AND user_id > $2
+                AND user_id % $4 = $5
+                ORDER BY user_id
+                LIMIT $3
+                """,
+                now, int(after), int(limit), int(shards), int(shard)
+            )
+        elif audience == "unsubs":
+            rows = await conn.fetch(
+                """
+                SELECT u.user_id
+                FROM users u
+                LEFT JOIN user_access ua ON u.user_id = ua.user_id
+                WHERE (ua.expires_at IS NULL OR ua.expires_at <= $1)
+                AND u.is_blocked = FALSE
+                AND u.user_id > $2
+                AND u.user_id % $4 = $5
+                ORDER BY u.user_id
+                LIMIT $3
+                """,
+                now, int(after), int(limit), int(shards), int(shard)
+            )
+        else:
+            raise ValueError(f"unknown audience: {audience!r}")
+
+        return [int(r["user_id"]) for r in rows]
+
+
+async def count_audience(audience: str) -> int:
+    pool = get_pool()
+    now = int(time.time())
+
+    async with pool.acquire() as conn:
+        if audience == "all":
+            v = await conn.fetchval("SELECT COUNT(*) FROM users WHERE is_blocked = FALSE")
+        elif audience == "subs":
+            v = await conn.fetchval("SELECT COUNT(*) FROM user_access WHERE expires_at > $1", now)
+        elif audience == "unsubs":
+            v = await conn.fetchval(
+                """
+                SELECT COUNT(*)
+                FROM users u
+                LEFT JOIN user_access ua ON u.user_id = ua.user_id
+                WHERE (ua.expires_at IS NULL OR ua.expires_at <= $1)
+                AND u.is_blocked = FALSE
+                """,
+                now
+            )
+        else:
+            raise ValueError(f"unknown audience: {audience!r}")
+
+        return int(v or 0)
+
+
+async def iter_audience(
+    audience: str,
+    *,
+    after: int = 0,
+    chunk: int = 500,
+    shards: int = 1,
+    shard: int = 0,
+) -> AsyncIterator[List[int]]:
+    """
+    Audience'ni keyset pagination bilan bo'laklab beradi (user_id > last).
+    Har bir bo'lak uchun pool qisqa vaqtga olinadi -> xotira o'zgarmas,
+    broadcast birinchi bo'lakdan darrov boshlanadi.
+    """
+    last = int(after)
+    while True:
+        page = await list_audience_page(audience, after=last, limit=chunk, shards=shards, shard=shard)
+        if not page:
+            return
+        yield page
+        if len(page) < chunk:
+            return
+        last = page[-1]
@@ -0,0 +1,248 @@
+# db/broadcast_jobs.py
+from __future__ import annotations
+import time
+from typing import List, Optional, Set, Tuple
+from db.core import get_pool
+
+_JOB_COLS = """
+    id, admin_id, status_chat_id, status_message_id, from_chat_id, message_id,
+    audience, status, cursor, total, sent, failed, shards, created_at
+"""
+
+
+async def create_broadcast_job(
+    *,
+    admin_id: int,
+    from_chat_id: int,
+    message_id: int,
+    audience: str,
+    total: int,
+    shards: int = 1,
+    status_chat_id: Optional[int] = None,
+    status_message_id: Optional[int] = None,
+) -> dict:
+    """Job + uning shards ta shard qatori (user_id % shards) bitta tranzaksiyada."""
+    now = int(time.time())
+    shards = max(1, int(shards))
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow(
+                f"""
+                INSERT INTO broadcast_jobs (
+                    admin_id, status_chat_id, status_message_id, from_chat_id, message_id,
+                    audience, total, shards, created_at, updated_at
+                )
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $9)
+                RETURNING {_JOB_COLS}
+                """,
+                int(admin_id), status_chat_id, status_message_id,
+                int(from_chat_id), int(message_id), audience, int(total), shards, now
+            )
+            await conn.execute(
+                """
+                INSERT INTO broadcast_shards (job_id, shard)
+                SELECT $1, g FROM generate_series(0, $2 - 1) AS g
+                """,
+                int(row["id"]), shards
+            )
+    return dict(row)
+
+
+async def ensure_broadcast_shards() -> int:
+    """
+    Sharding'dan oldin yaratilgan, tugallanmagan joblar: bitta shard
+    (job cursor'i bilan) -> ular ham lease orqali davom etadi.
+    """
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        res = await conn.execute(
+            """
+            INSERT INTO broadcast_shards (job_id, shard, cursor)
+            SELECT j.id, 0, j.cursor
+            FROM broadcast_jobs j
+            WHERE j.status = 'running'
+            AND NOT EXISTS (SELECT 1 FROM broadcast_shards s WHERE s.job_id = j.id)
+            ON CONFLICT (job_id, shard) DO NOTHING
+            """
+        )
+    return int(res.split()[-1])
+
+
+async def lease_broadcast_shard(owner: str, lease_sec: int) -> Optional[dict]:
+    """
+    Bo'sh (lease'i yo'q yoki muddati o'tgan) birinchi shardni owner'ga beradi.
+    FOR UPDATE SKIP LOCKED -> parallel workerlar bir-birini kutmaydi
+    va bitta shardni ikkitasi olmaydi. Return: shard + job maydonlari yoki None.
+    """
+    now = int(time.time())
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            WITH pick AS (
+                SELECT s.job_id, s.shard
+                FROM broadcast_shards s
+                JOIN broadcast_jobs j ON j.id = s.job_id
+                WHERE s.status = 'running' AND s.lease_until < $2
+                AND j.status = 'running'
+                ORDER BY s.job_id, s.shard
+                LIMIT 1
+                FOR UPDATE OF s SKIP LOCKED
+            )
+            UPDATE broadcast_shards s
+            SET lease_owner = $1, lease_until = $3
+            FROM pick, broadcast_jobs j
+            WHERE s.job_id = pick.job_id AND s.shard = pick.shard AND j.id = pick.job_id
+            RETURNING
+                s.job_id, s.shard, s.cursor, j.shards, j.audience,
+                j.from_chat_id, j.message_id, j.status_chat_id, j.status_message_id,
+                j.total, j.created_at
+            """,
+            owner, now, now + int(lease_sec)
+        )
+    return dict(row) if row else None
+
+
+async def renew_broadcast_lease(job_id: int, shard: int, owner: str, lease_sec: int) -> bool:
+    """False -> lease boshqa workerga o'tgan (muddati o'tib ketgan), shard to'xtatiladi."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        res = await conn.execute(
+            """
+            UPDATE broadcast_shards SET lease_until = $4
+            WHERE job_id = $1 AND shard = $2 AND lease_owner = $3 AND status = 'running'
+            """,
+            int(job_id), int(shard), owner, int(time.time()) + int(lease_sec)
+        )
+    return res.split()[-1] != "0"
+
+
+async def count_broadcast_workers() -> int:
+    """Hozir kamida bitta shard lease qilib turgan processlar soni (global rate budjeti uchun)."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        v = await conn.fetchval(
+            """
+            SELECT COUNT(DISTINCT lease_owner) FROM broadcast_shards
+            WHERE status = 'running' AND lease_until >= $1
+            """,
+            int(time.time())
+        )
+    return int(v or 0)
+
+
+async def get_delivered(job_id: int, user_ids: List[int]) -> Set[int]:
+    """Cursor'dan keyin, lekin allaqachon yuborilganlar (restartdan oldingi chunk)."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT user_id FROM broadcast_deliveries
+            WHERE job_id = $1 AND user_id = ANY($2::bigint[])
+            """,
+            int(job_id), [int(x) for x in user_ids]
+        )
+    return {int(r["user_id"]) for r in rows}
+
+
+async def mark_deliveries(job_id: int, results: List[Tuple[int, bool]]) -> None:
+    """
+    Delivery markerlari bulk (bitta unnest INSERT): chunk commit qilinmay
+    to'xtaganda (lease yo'qoldi / xato) yuborilganlar qayta yuborilmasin.
+    """
+    if not results:
+        return
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO broadcast_deliveries (job_id, user_id, ok)
+            SELECT $1, t.user_id, t.ok FROM unnest($2::bigint[], $3::bool[]) AS t(user_id, ok)
+            ON CONFLICT (job_id, user_id) DO NOTHING
+            """,
+            int(job_id), [int(u) for u, _ in results], [bool(ok) for _, ok in results]
+        )
+
+
+async def commit_shard_cursor(
+    job_id: int,
+    shard: int,
+    shards: int,
+    cursor: int,
+    owner: str,
+    results: List[Tuple[int, bool]] = (),
+) -> Optional[dict]:
+    """
+    Shard chunk'i tugadi (bitta so'rov): chunk natijalari (results) va shu
+    shardning cursor gacha qolgan markerlari (oldingi egasidan) job
+    counterlariga qo'shiladi, markerlar o'chiriladi, shard cursor'i suriladi.
+    results markerga yozilmaydi: commit bilan birga hisoblanadi.
+    Lease owner'da bo'lmasa hech narsa o'zgarmaydi -> None.
+    Return: job bo'yicha {sent, failed, total, created_at}.
+    """
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            WITH lease AS (
+                UPDATE broadcast_shards SET cursor = GREATEST(cursor, $4)
+                WHERE job_id = $1 AND shard = $2 AND lease_owner = $5
+                RETURNING job_id
+            ), done AS (
+                DELETE FROM broadcast_deliveries
+                WHERE job_id = $1 AND user_id <= $4 AND user_id % $3 = $2
+                AND EXISTS (SELECT 1 FROM lease)
+                RETURNING ok
+            ), page AS (
+                SELECT ok FROM unnest($7::bool[]) AS t(ok)
+                UNION ALL
+                SELECT ok FROM done
+            )
+            UPDATE broadcast_jobs SET
+                sent = sent + (SELECT COUNT(*) FROM page WHERE ok),
+                failed = failed + (SELECT COUNT(*) FROM page WHERE NOT ok),
+                updated_at = $6
+            WHERE id = $1 AND EXISTS (SELECT 1 FROM lease)
+            RETURNING sent, failed, total, created_at
+            """,
+            int(job_id), int(shard), int(shards), int(cursor), owner, int(time.time()),
+            [bool(ok) for _, ok in results]
+        )
+    return dict(row) if row else None
+
+
+async def finish_broadcast_shard(job_id: int, shard: int, owner: str) -> Tuple[bool, Optional[dict]]:
+    """
+    Shard tugadi. Return: (owned, job). owned=False -> lease bizda emas, hech
+    narsa o'zgarmadi. Oxirgi shard bo'lsa job ham 'done' bo'ladi va
+    job = {sent, failed, total, created_at, finished_at}, aks holda None.
+    Job qatori lock qilinadi -> parallel tugagan ikki shard jobni o'tkazib yubormaydi.
+    """
+    now = int(time.time())
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT 1 FROM broadcast_jobs WHERE id = $1 FOR UPDATE", int(job_id))
+            res = await conn.execute(
+                """
+                UPDATE broadcast_shards SET status = 'done', lease_until = 0
+                WHERE job_id = $1 AND shard = $2 AND lease_owner = $3 AND status = 'running'
+                """,
+                int(job_id), int(shard), owner
+            )
+            if res.split()[-1] == "0":
+                return False, None
+            row = await conn.fetchrow(
+                """
+                UPDATE broadcast_jobs
+                SET status = 'done', finished_at = $2, updated_at = $2
+                WHERE id = $1 AND status = 'running'
+                AND NOT EXISTS (
+                    SELECT 1 FROM broadcast_shards WHERE job_id = $1 AND status <> 'done'
+                )
+                RETURNING sent, failed, total, created_at, finished_at
+                """,
+                int(job_id), now
+            )
+    return True, (dict(row) if row else None)
@@ -0,0 +1,128 @@
+# db/deletions.py
+from __future__ import annotations
+from typing import Iterable, List, Optional, Tuple
+from db.core import get_pool
+
+
+async def add_pending_deletion(
+    *,
+    chat_id: int,
+    message_id: int,
+    due_at: int,
+    owner: Optional[str] = None,
+    lease_until: int = 0,
+) -> None:
+    """owner berilsa qator darrov shu scheduler'ga claim qilingan holda yoziladi."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO pending_deletions (chat_id, message_id, due_at, attempts, owner, lease_until)
+            VALUES ($1, $2, $3, 0, $4, $5)
+            ON CONFLICT (chat_id, message_id)
+            DO UPDATE SET due_at = EXCLUDED.due_at, attempts = 0,
+                          owner = EXCLUDED.owner, lease_until = EXCLUDED.lease_until
+            """,
+            int(chat_id), int(message_id), int(due_at), owner, int(lease_until)
+        )
+
+
+async def claim_due_deletions(
+    *,
+    owner: str,
+    until: int,
+    now: int,
+    grace: int,
+    limit: int = 5000,
+) -> List[dict]:
+    """
+    due_at <= until bo'lgan, hech kimga claim qilinmagan (lease_until < now)
+    yoki allaqachon owner'niki bo'lgan qatorlar owner'ga beriladi (due_at bo'yicha).
+    FOR UPDATE SKIP LOCKED -> bir nechta bot process bitta qatorni olmaydi.
+    Lease: due_at + grace; owner o'lsa shundan keyin boshqa process oladi.
+    """
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            UPDATE pending_deletions d
+            SET owner = $1, lease_until = GREATEST(d.due_at, $3) + $4
+            FROM (
+                SELECT chat_id, message_id
+                FROM pending_deletions
+                WHERE due_at <= $2 AND (lease_until < $3 OR owner = $1)
+                ORDER BY due_at
+                LIMIT $5
+                FOR UPDATE SKIP LOCKED
+            ) c
+            WHERE d.chat_id = c.chat_id AND d.message_id = c.message_id
+            RETURNING d.chat_id, d.message_id, d.due_at, d.attempts
+            """,
+            owner, int(until), int(now), int(grace), int(limit)
+        )
+    out = [
+        {
+            "chat_id": int(r["chat_id"]),
+            "message_id": int(r["message_id"]),
+            "due_at": int(r["due_at"]),
+            "attempts": int(r["attempts"]),
+        }
+        for r in rows
+    ]
+    out.sort(key=lambda r: r["due_at"])  # RETURNING tartibi kafolatlanmagan
+    return out
+
+
+async def remove_pending_deletions(items: Iterable[Tuple[int, int]]) -> None:
+    items = list(items)
+    if not items:
+        return
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            DELETE FROM pending_deletions d
+            USING unnest($1::bigint[], $2::bigint[]) AS x(chat_id, message_id)
+            WHERE d.chat_id = x.chat_id AND d.message_id = x.message_id
+            """,
+            [int(c) for c, _ in items], [int(m) for _, m in items]
+        )
+
+
+async def delay_pending_deletion(
+    *,
+    chat_id: int,
+    message_id: int,
+    now: int,
+    owner: Optional[str] = None,
+    grace: int = 0,
+) -> Tuple[int, int]:
+    """
+    Vaqtinchalik xato: 2, 4, 8 ... (max 10 daqiqa) keyinga suriladi,
+    lease ham yangi due_at + grace gacha uzayadi (qator owner'da qoladi).
+    Return: (attempts, yangi due_at); qator yo'q bo'lsa (0, 0).
+    """
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            UPDATE pending_deletions
+            SET attempts = attempts + 1,
+                due_at = $3 + LEAST(600, (2 ^ (attempts + 1))::bigint),
+                owner = $4,
+                lease_until = $3 + LEAST(600, (2 ^ (attempts + 1))::bigint) + $5
+            WHERE chat_id = $1 AND message_id = $2
+            RETURNING attempts, due_at
+            """,
+            int(chat_id), int(message_id), int(now), owner, int(grace)
+        )
+    if not row:
+        return 0, 0
+    return int(row["attempts"]), int(row["due_at"])
+
+
+async def count_pending_deletions() -> int:
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        v = await conn.fetchval("SELECT COUNT(*) FROM pending_deletions")
+    return int(v or 0)
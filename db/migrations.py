@@ -1,8 +1,11 @@
 # db/migrations.py
 from __future__ import annotations
 import time
+import logging
 from db.core import get_pool
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_CHANNEL_ID = -1002297106905
 
 async def _table_exists(conn, name: str, schema: str = "public") -> bool:
@@ -38,7 +41,10 @@ async def migrate_movies_table(conn) -> None:
                 title_raw TEXT,
                 title_norm TEXT,
                 message_id BIGINT NOT NULL,
-                created_at BIGINT NOT NULL
+                created_at BIGINT NOT NULL,
+                series_key TEXT,
+                season INTEGER,
+                episode INTEGER
             )
             """
         )
@@ -59,6 +65,13 @@ async def migrate_movies_table(conn) -> None:
                 "UPDATE movies SET created_at=$1 WHERE created_at IS NULL;",
                 int(time.time()),
             )
+        # serial guruhlash: ingest paytida hisoblanadi (scripts/backfill_series.py)
+        if not await _column_exists(conn, "movies", "series_key"):
+            await conn.execute("ALTER TABLE movies ADD COLUMN series_key TEXT;")
+        if not await _column_exists(conn, "movies", "season"):
+            await conn.execute("ALTER TABLE movies ADD COLUMN season INTEGER;")
+        if not await _column_exists(conn, "movies", "episode"):
+            await conn.execute("ALTER TABLE movies ADD COLUMN episode INTEGER;")
 
     await conn.execute(
         """
@@ -78,6 +91,12 @@ async def migrate_movies_table(conn) -> None:
         ON movies(title_raw)
         """
     )
+    await conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_movies_series
+        ON movies(series_key, season, episode)
+        """
+    )
 
     await conn.execute(
         """
@@ -98,7 +117,36 @@ async def migrate_movies_table(conn) -> None:
         """
     )
 
-async def init_db() -> None:
+async def migrate_search_trgm(conn) -> bool:
+    """
+    Ixtiyoriy: pg_trgm + GIN trigram indekslar.
+    B-tree indekslar '%tok%' / word_similarity so'rovlariga yordam bermaydi.
+    Extension yaratish huquqi bo'lmasa, migratsiya to'xtamasin (savepoint).
+    Return: pg_trgm tayyor bo'lsa True.
+    """
+    try:
+        async with conn.transaction():
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_movies_title_norm_trgm
+                ON movies USING gin (title_norm gin_trgm_ops)
+                """
+            )
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_aliases_norm_trgm
+                ON movie_aliases USING gin (alias_norm gin_trgm_ops)
+                """
+            )
+    except Exception:
+        logger.exception("pg_trgm migration failed, trigram search unavailable")
+        return False
+    return True
+
+async def init_db(*, trgm: bool = False) -> bool:
+    """Return: trgm=True bo'lsa pg_trgm migratsiyasi muvaffaqiyatli bo'ldimi (aks holda False)."""
+    trgm_ok = False
     pool = get_pool()
     async with pool.acquire() as conn:
         async with conn.transaction():
@@ -114,6 +162,8 @@ async def init_db() -> None:
             """)
 
             await migrate_movies_table(conn)
+            if trgm:
+                trgm_ok = await migrate_search_trgm(conn)
 
             await conn.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -157,4 +207,77 @@ async def init_db() -> None:
             )
             """)
             await conn.execute("CREATE INDEX IF NOT EXISTS idx_search_created ON search_logs(created_at)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_search_user ON search_logs(user_id)")
\ No newline at end of file
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_search_user ON search_logs(user_id)")
+
+            # pagination sessiyalari: callback_data faqat qisqa id saqlaydi
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_sessions (
+                id BIGSERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                movie_ids BIGINT[] NOT NULL,
+                created_at BIGINT NOT NULL
+            )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_search_sessions_created ON search_sessions(created_at)")
+
+            # TTL o'chirishlar: restartdan keyin ham protected kontent qolib ketmasin
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_deletions (
+                chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                due_at BIGINT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (chat_id, message_id)
+            )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_deletions_due ON pending_deletions(due_at)")
+
+            # broadcast: restartdan keyin cursor'dan davom etadi
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                admin_id BIGINT NOT NULL,
+                status_chat_id BIGINT,
+                status_message_id BIGINT,
+                from_chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                audience TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                cursor BIGINT NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                created_at BIGINT NOT NULL,
+                updated_at BIGINT NOT NULL,
+                finished_at BIGINT
+            )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status)")
+
+            # cursor'dan keyingi, allaqachon yuborilganlar (chunk ichidagi progress)
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+                job_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                ok BOOLEAN NOT NULL,
+                PRIMARY KEY (job_id, user_id)
+            )
+            """)
+
+            # broadcast sharding: har shard o'z cursor'i va lease'i bilan
+            await conn.execute("ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS shards INTEGER NOT NULL DEFAULT 1")
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_shards (
+                job_id BIGINT NOT NULL,
+                shard INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                cursor BIGINT NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_until BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (job_id, shard)
+            )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_shards_lease ON broadcast_shards(status, lease_until)")
+    return trgm_ok
@@ -1,29 +1,194 @@
 # db/movies.py
 from __future__ import annotations
+import asyncio
+import json
 import time
-from typing import List
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
 from db.core import get_pool
 from db.utils import normalize
+from utils.text import series_info
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CHANGE FEED
+# =========================
+@dataclass(slots=True)
+class MovieEvent:
+    """
+    kind:
+      "upsert" -> kino qo'shildi/yangilandi (aliases = qo'shilgan alias_norm lar)
+      "alias"  -> mavjud kinoga alias qo'shildi
+      "delete" -> kino o'chirildi
+    """
+    kind: str
+    channel_id: int
+    message_id: int
+    id: int = 0
+    title: str = ""
+    title_norm: str = ""
+    created_at: int = 0
+    aliases: List[str] = field(default_factory=list)
+    series_key: str | None = None
+    season: int | None = None
+    episode: int | None = None
+
+
+MovieListener = Callable[[MovieEvent], None]
+_listeners: List[MovieListener] = []
+
+# har bir yozuvda oshadi; search cache'lar shu bilan eskirganini biladi
+_catalog_version = 0
+
+
+def catalog_version() -> int:
+    return _catalog_version
+
+
+def subscribe(listener: MovieListener) -> None:
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def unsubscribe(listener: MovieListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _publish(event: MovieEvent) -> None:
+    global _catalog_version
+    _catalog_version += 1
+
+    # yozuv commit bo'lgandan keyin chaqiriladi; listener xatosi yozuvni buzmasin
+    for fn in list(_listeners):
+        try:
+            fn(event)
+        except Exception:
+            logger.exception("movie listener failed: kind=%s key=(%s, %s)",
+                             event.kind, event.channel_id, event.message_id)
+
+
+# =========================
+# CROSS-PROCESS (LISTEN/NOTIFY)
+# =========================
+MOVIE_CHANNEL = "movie_events"
+_ORIGIN = uuid.uuid4().hex[:12]  # o'zimiz yuborgan NOTIFY qayta qo'llanmasin
+
+
+async def _notify(conn, kind: str, channel_id: int, message_id: int) -> None:
+    """
+    Yozuv bilan bitta connection'da (tranzaksiya bo'lsa commit bilan birga)
+    boshqa processlarga signal. Payload kichik: qabul qiluvchi qatorni DBdan o'qiydi.
+    """
+    payload = json.dumps({"o": _ORIGIN, "k": kind, "c": int(channel_id), "m": int(message_id)})
+    await conn.execute("SELECT pg_notify($1, $2)", MOVIE_CHANNEL, payload)
+
+
+async def fetch_movie_event(channel_id: int, message_id: int) -> MovieEvent:
+    """Kinoning hozirgi holati (barcha aliaslari bilan) upsert event sifatida; yo'q bo'lsa delete."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT id, COALESCE(title_raw, title) AS title, title_norm, created_at,
+                   series_key, season, episode
+            FROM movies
+            WHERE channel_id = $1 AND message_id = $2
+            """,
+            int(channel_id), int(message_id)
+        )
+        if row is None:
+            return MovieEvent(kind="delete", channel_id=int(channel_id), message_id=int(message_id))
+        aliases = await conn.fetch(
+            "SELECT alias_norm FROM movie_aliases WHERE channel_id = $1 AND message_id = $2",
+            int(channel_id), int(message_id)
+        )
+
+    return MovieEvent(
+        kind="upsert", channel_id=int(channel_id), message_id=int(message_id),
+        id=int(row["id"]), title=row["title"] or "", title_norm=row["title_norm"] or "",
+        created_at=int(row["created_at"] or 0), aliases=[a["alias_norm"] or "" for a in aliases],
+        series_key=row["series_key"], season=row["season"], episode=row["episode"],
+    )
+
+
+async def listen_movie_changes(
+    *,
+    ready: Optional[asyncio.Event] = None,
+    on_reconnect: Optional[Callable[[], Awaitable[object]]] = None,
+    retry_sec: float = 5.0,
+) -> None:
+    """
+    Boshqa processlardagi add_movie / add_alias / delete lar shu processning
+    change-feed'iga (_publish) keladi -> CATALOG, catalog_version, process pool.
+    Ulanish uzilsa qayta ulanadi va on_reconnect() (katalog reload) chaqiriladi,
+    chunki uzilish paytidagi NOTIFY lar yo'qolgan bo'ladi.
+    """
+    first = True
+    while True:
+        try:
+            pool = get_pool()
+            async with pool.acquire() as conn:
+                queue: asyncio.Queue[str] = asyncio.Queue()
+                await conn.add_listener(MOVIE_CHANNEL, lambda _c, _pid, _ch, payload: queue.put_nowait(payload))
+                if not first and on_reconnect is not None:
+                    await on_reconnect()
+                first = False
+                if ready is not None:
+                    ready.set()
+
+                while not conn.is_closed():
+                    try:
+                        payload = await asyncio.wait_for(queue.get(), timeout=30)
+                    except asyncio.TimeoutError:
+                        continue
+                    msg = json.loads(payload)
+                    if msg.get("o") == _ORIGIN:
+                        continue
+                    _publish(await fetch_movie_event(msg["c"], msg["m"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("movie LISTEN failed, reconnecting in %.0fs", retry_sec)
+        first = False
+        await asyncio.sleep(retry_sec)
 
 async def add_movie(*, title: str, message_id: int, channel_id: int) -> None:
     pool = get_pool()
     now = int(time.time())
     raw = (title or "").strip()[:150]
     norm = normalize(raw)
+    skey, season, episode = series_info(raw)
 
     async with pool.acquire() as conn:
-        await conn.execute(
+        row = await conn.fetchrow(
             """
-            INSERT INTO movies (channel_id, message_id, title, title_raw, title_norm, created_at)
-            VALUES ($1, $2, $3, $4, $5, $6)
+            INSERT INTO movies (channel_id, message_id, title, title_raw, title_norm, created_at,
+                                series_key, season, episode)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
             ON CONFLICT (channel_id, message_id) DO UPDATE SET
               title      = EXCLUDED.title,
               title_raw  = EXCLUDED.title_raw,
-              title_norm = EXCLUDED.title_norm
+              title_norm = EXCLUDED.title_norm,
+              series_key = EXCLUDED.series_key,
+              season     = EXCLUDED.season,
+              episode    = EXCLUDED.episode
+            RETURNING id, created_at
             """,
             int(channel_id), int(message_id),
-            raw, raw, norm, now
+            raw, raw, norm, now, skey, season, episode
         )
+        await _notify(conn, "upsert", channel_id, message_id)
+
+    _publish(MovieEvent(
+        kind="upsert", channel_id=int(channel_id), message_id=int(message_id),
+        id=int(row["id"]), title=raw, title_norm=norm, created_at=int(row["created_at"] or 0),
+        series_key=skey, season=season, episode=episode,
+    ))
 
 async def add_alias(*, alias: str, message_id: int, channel_id: int) -> None:
     raw = (alias or "").strip()[:150]
@@ -42,12 +207,18 @@ async def add_alias(*, alias: str, message_id: int, channel_id: int) -> None:
             """,
             int(channel_id), int(message_id), raw, norm, now
         )
+        await _notify(conn, "alias", channel_id, message_id)
+
+    _publish(MovieEvent(
+        kind="alias", channel_id=int(channel_id), message_id=int(message_id), aliases=[norm],
+    ))
 
 async def add_movie_with_aliases(*, title: str, aliases: List[str], message_id: int, channel_id: int) -> None:
     raw_title = (title or "").strip()[:150]
     if not raw_title:
         return
     norm_title = normalize(raw_title)
+    skey, season, episode = series_info(raw_title)
     now = int(time.time())
 
     # aliaslarni uniq + normalize
@@ -66,17 +237,22 @@ async def add_movie_with_aliases(*, title: str, aliases: List[str], message_id:
     pool = get_pool()
     async with pool.acquire() as conn:
         async with conn.transaction():
-            await conn.execute(
+            row = await conn.fetchrow(
                 """
-                INSERT INTO movies (channel_id, message_id, title, title_raw, title_norm, created_at)
-                VALUES ($1, $2, $3, $4, $5, $6)
+                INSERT INTO movies (channel_id, message_id, title, title_raw, title_norm, created_at,
+                                    series_key, season, episode)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
                 ON CONFLICT (channel_id, message_id) DO UPDATE SET
                   title      = EXCLUDED.title,
                   title_raw  = EXCLUDED.title_raw,
-                  title_norm = EXCLUDED.title_norm
+                  title_norm = EXCLUDED.title_norm,
+                  series_key = EXCLUDED.series_key,
+                  season     = EXCLUDED.season,
+                  episode    = EXCLUDED.episode
+                RETURNING id, created_at
                 """,
                 int(channel_id), int(message_id),
-                raw_title, raw_title, norm_title, now
+                raw_title, raw_title, norm_title, now, skey, season, episode
             )
 
             if cleaned:
@@ -92,6 +268,14 @@ async def add_movie_with_aliases(*, title: str, aliases: List[str], message_id:
                     """,
                     int(channel_id), int(message_id), now, alias_raws, alias_norms
                 )
+            await _notify(conn, "upsert", channel_id, message_id)
+
+    _publish(MovieEvent(
+        kind="upsert", channel_id=int(channel_id), message_id=int(message_id),
+        id=int(row["id"]), title=raw_title, title_norm=norm_title,
+        created_at=int(row["created_at"] or 0), aliases=[x[1] for x in cleaned],
+        series_key=skey, season=season, episode=episode,
+    ))
 
 async def delete_movie_by_message_id(*, message_id: int, channel_id: int) -> None:
     pool = get_pool()
@@ -105,6 +289,9 @@ async def delete_movie_by_message_id(*, message_id: int, channel_id: int) -> Non
                 "DELETE FROM movies WHERE message_id=$1 AND channel_id=$2",
                 int(message_id), int(channel_id)
             )
+            await _notify(conn, "delete", channel_id, message_id)
+
+    _publish(MovieEvent(kind="delete", channel_id=int(channel_id), message_id=int(message_id)))
 
 async def get_movies_limit(limit: int = 300):
     pool = get_pool()
@@ -242,3 +429,73 @@ async def get_movies_like(query: str, limit: int = 20):
             *params
         )
         return [dict(r) for r in rows]
+
+
+async def get_movies_trgm(query: str, limit: int = 120):
+    """
+    pg_trgm varianti: title_norm / alias_norm bo'yicha bitta so'rov,
+    GIN indeks (<% operatori) + word_similarity bo'yicha tartiblangan kandidatlar.
+    migrate_search_trgm() ishlagan bo'lishi kerak.
+    """
+    q = normalize(query).strip()
+    if not q:
+        return []
+
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            WITH cand AS (
+              SELECT m.channel_id, m.message_id, COALESCE(m.title_raw, m.title) AS title,
+                     m.created_at, word_similarity($1, m.title_norm) AS sim
+              FROM movies m
+              WHERE $1 <% m.title_norm
+
+              UNION ALL
+
+              SELECT m.channel_id, m.message_id, COALESCE(m.title_raw, m.title) AS title,
+                     m.created_at, word_similarity($1, a.alias_norm) AS sim
+              FROM movies m
+              JOIN movie_aliases a
+                ON a.channel_id = m.channel_id AND a.message_id = m.message_id
+              WHERE $1 <% a.alias_norm
+            ),
+            best AS (
+              SELECT DISTINCT ON (channel_id, message_id)
+                title, message_id, channel_id, created_at, sim
+              FROM cand
+              ORDER BY channel_id, message_id, sim DESC
+            )
+            SELECT title, message_id, channel_id, sim
+            FROM best
+            ORDER BY sim DESC, created_at DESC
+            LIMIT $2
+            """,
+            q, int(limit)
+        )
+    return [dict(r) for r in rows]
+
+
+async def fetch_catalog():
+    """Katalog indeksi uchun barcha movies + movie_aliases ni o'qiydi."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        movies = await conn.fetch(
+            """
+            SELECT id, channel_id, message_id,
+                   COALESCE(title_raw, title) AS title,
+                   COALESCE(title_norm, '') AS title_norm,
+                   COALESCE(created_at, 0) AS created_at,
+                   series_key, season, episode
+            FROM movies
+            """
+        )
+        aliases = await conn.fetch(
+            """
+            SELECT a.channel_id, a.message_id, COALESCE(a.alias_norm, '') AS alias_norm
+            FROM movie_aliases a
+            JOIN movies m
+              ON m.channel_id = a.channel_id AND m.message_id = a.message_id
+            """
+        )
+    return [dict(r) for r in movies], [dict(r) for r in aliases]
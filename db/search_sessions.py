@@ -0,0 +1,69 @@
+# db/search_sessions.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import List, Optional
+from db.core import get_pool
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 24 * 60 * 60
+
+
+async def save_search_session(*, user_id: int, movie_ids: List[int]) -> int:
+    now = int(time.time())
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        sid = await conn.fetchval(
+            """
+            INSERT INTO search_sessions (user_id, movie_ids, created_at)
+            VALUES ($1, $2::bigint[], $3)
+            RETURNING id
+            """,
+            int(user_id), [int(x) for x in movie_ids], now
+        )
+    return int(sid)
+
+
+async def get_search_session(session_id: int) -> Optional[dict]:
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT user_id, movie_ids, created_at
+            FROM search_sessions
+            WHERE id=$1 AND created_at >= $2
+            """,
+            int(session_id), int(time.time()) - SESSION_TTL
+        )
+    if not row:
+        return None
+    return {
+        "user_id": int(row["user_id"]),
+        "movie_ids": [int(x) for x in row["movie_ids"]],
+        "created_at": int(row["created_at"]),
+    }
+
+
+async def purge_search_sessions() -> int:
+    """SESSION_TTL dan eski sessiyalarni o'chiradi; nechtasi o'chganini qaytaradi."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        res = await conn.execute(
+            "DELETE FROM search_sessions WHERE created_at < $1",
+            int(time.time()) - SESSION_TTL
+        )
+    return int(res.split()[-1])
+
+
+async def run_search_session_purge(*, interval_sec: int = 3600) -> None:
+    """Background task: eski sessiyalar har interval_sec da tozalanadi (search yo'lida emas)."""
+    while True:
+        try:
+            n = await purge_search_sessions()
+            if n:
+                logger.info("search_sessions purged: %d", n)
+        except Exception:
+            logger.exception("search_sessions purge failed")
+        await asyncio.sleep(interval_sec)
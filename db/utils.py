@@ -1,20 +1,3 @@
 # db/utils.py
-import re
-_ws = re.compile(r"\s+")
-_punct = re.compile(r"[^\w\s]", re.UNICODE)
-
-def normalize(s: str) -> str:
-    s = (s or "").lower()
-
-    # apostroflarni bir xil qilish
-    s = s.replace("’", "'").replace("`", "'").replace("ʻ", "'")
-
-    # kirill → lotin minimal mapping (kino bot uchun yetarli)
-    s = s.replace("ё", "e").replace("й", "i")
-
-    # punktuatsiyani space ga aylantiramiz
-    s = _punct.sub(" ", s)
-
-    # space’larni tekislaymiz
-    s = _ws.sub(" ", s).strip()
-    return s
\ No newline at end of file
+# normalize endi utils/text.py da (db ga bog'liq emas); eski importlar uchun
+from utils.text import normalize  # noqa: F401
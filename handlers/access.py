@@ -23,17 +23,6 @@ _REQ_COOLDOWN_SEC = 30
 _LAST_REQ: dict[int, float] = {}
 
 
-async def is_user_active(user_id: int) -> bool:
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        res = await conn.fetchval(
-            "SELECT expires_at FROM user_access WHERE user_id=$1",
-            user_id
-        )
-        if res and res > int(time.time()):
-            return True
-        return False
-
 def _can_request(user_id: int) -> bool:
     now = time.time()
     last = _LAST_REQ.get(user_id, 0.0)
@@ -4,24 +4,24 @@ from __future__ import annotations
 import logging
 import datetime
 import time
-import asyncio
 from db.stats import get_today_stats
 
 from aiogram import Router, F, types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 
 from utils.search_cache import SEARCH_CACHE
+from utils.access_cache import ACCESS_CACHE, ACTIVE_SUBS
+from service.search import RESULT_CACHE
+from middlewares import access as access_mw
 from db.access import (
     grant_access,
     extend_access,
     has_access,
     count_active_subs,
-    list_active_user_ids
 )
 from db.users import count_users
 from db.audit import auditj
-from db.broadcast import list_all_users, list_unsubscribed_users, set_user_blocked
+from service.broadcast_jobs import start_broadcast_job
 
 # ----------------------------
 # GLOBALS
@@ -134,61 +134,16 @@ async def handle_broadcast(message: types.Message):
     if not mode:
         return
 
-    # foydalanuvchilarni olish
     if mode == "bc_all":
-        user_ids = await list_all_users()
+        audience = "all"
     elif mode == "bc_subs":
-        user_ids = await list_active_user_ids()
+        audience = "subs"
     else:
-        user_ids = await list_unsubscribed_users()
+        audience = "unsubs"
 
-    if not user_ids:
+    # ✅ persisted job: fonda ishlaydi, restartdan keyin cursor'dan davom etadi
+    if not await start_broadcast_job(message, audience):
         await message.answer("⚠️ Foydalanuvchilar topilmadi.")
-        broadcast_mode.pop(message.from_user.id, None)
-        return
-
-    src = message.reply_to_message
-    sent = 0
-    failed = 0
-
-    status = await message.answer(f"📣 Yuborilyapti... 0/{len(user_ids)}")
-
-    for i, uid in enumerate(user_ids, start=1):
-        try:
-            await message.bot.copy_message(
-                chat_id=uid,
-                from_chat_id=src.chat.id,
-                message_id=src.message_id,
-            )
-            sent += 1
-
-        except (TelegramForbiddenError, TelegramBadRequest):
-            failed += 1
-            await set_user_blocked(uid)
-
-        except Exception as e:
-            failed += 1
-            logger.exception("Broadcast error uid=%s: %s", uid, e)
-
-        # throttle
-        if i % 10 == 0:
-            await asyncio.sleep(1)
-
-        # progress update
-        if i % 50 == 0 or i == len(user_ids):
-            try:
-                await status.edit_text(f"📣 Yuborilyapti... {i}/{len(user_ids)}")
-            except Exception:
-                pass
-
-    await status.edit_text(
-        f"✅ Broadcast tugadi\n\n"
-        f"📨 Yuborildi: {sent}\n"
-        f"❌ Yetmadi: {failed}\n"
-        f"👥 Jami: {len(user_ids)}"
-    )
-
-    broadcast_mode.pop(message.from_user.id, None)
 
 
 # ----------------------------
@@ -203,6 +158,7 @@ async def clear_cache_cmd(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         return
     SEARCH_CACHE.clear()
+    RESULT_CACHE.clear()
     await message.answer("✅ Search cache tozalandi.")
 
 
@@ -210,7 +166,23 @@ async def clear_cache_cmd(message: types.Message):
 async def cache_info_cmd(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    await message.answer(f"📦 SEARCH_CACHE keys: {len(SEARCH_CACHE)}")
+    rc = RESULT_CACHE.stats()
+    sc = SEARCH_CACHE.stats()
+    mw = access_mw.ACCESS_MIDDLEWARE
+    ac = mw.stats() if mw is not None else {"allowed": 0, "denied": 0, "errors": 0}
+    acc = ACCESS_CACHE.stats()
+    await message.answer(
+        f"📦 SEARCH_CACHE keys: {sc['size']}/{sc['max_entries']}\n"
+        f"💾 ~{sc['bytes'] // 1024} KB / {sc['max_bytes'] // (1024 * 1024)} MB\n"
+        f"⌛ Expired: {sc['expired']}, evicted: {sc['evictions']}\n\n"
+        f"🔎 Result cache: {rc['size']}/{rc['maxsize']}\n"
+        f"✅ Hit: {rc['hits']} ({rc['hit_rate']}%)\n"
+        f"❌ Miss: {rc['misses']} (eskirgan: {rc['stale']})\n"
+        f"🗑 Evicted: {rc['evictions']}\n\n"
+        f"🔐 Access: ruxsat {ac['allowed']}, rad {ac['denied']}, xato {ac['errors']}\n"
+        f"📥 Access cache: {acc['size']} (hit {acc['hits']}, miss {acc['misses']}, {acc['hit_rate']}%)"
+        + (" [preload]" if ACTIVE_SUBS.loaded else "")
+    )
 
 
 # ----------------------------
@@ -247,6 +219,7 @@ async def clear_cache_cb(callback: types.CallbackQuery):
         return
 
     SEARCH_CACHE.clear()
+    RESULT_CACHE.clear()
     await callback.answer("Cache tozalandi ✅", show_alert=True)
 
 
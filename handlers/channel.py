@@ -6,7 +6,6 @@ import re
 from utils.post_parser import parse_movie_post
 from db.movies import add_movie_with_aliases
 from db.audit import auditj
-from utils.search_cache import SEARCH_CACHE
 router = Router()
 logger = logging.getLogger(__name__)
 
@@ -67,7 +66,6 @@ async def channel_post_handler(message: types.Message):
         message_id=message.message_id,
         channel_id=message.chat.id,
     )
-    SEARCH_CACHE.clear()
 
     try:
         await auditj(
@@ -1,16 +1,17 @@
 # handlers/search.py
-import time, uuid, logging, re
+import uuid, logging, re
 from logging import Logger
 
 from aiogram import Router, F, types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.exceptions import TelegramBadRequest
 
-from utils.search_cache import SEARCH_CACHE
+from utils.search_cache import SEARCH_CACHE, SearchSession
 from utils.copy import safe_copy_with_ttl
 from db.movies import delete_movie_by_message_id
-from db.access import has_access
-from service.search import find_top_movies, extract_episode
+from db.search_sessions import save_search_session, get_search_session
+from service.catalog import CATALOG
+from service.search import search_movie_ids, find_episode, items_by_ids
 
 router = Router()
 logger: Logger = logging.getLogger(__name__)
@@ -20,13 +21,6 @@ CACHE_TTL = 10 * 60
 TTL = 6 * 60 * 60  # 6 soat
 TTL_HOURS = TTL // 3600
 
-def _cleanup_cache():
-    now = time.time()
-    for k in list(SEARCH_CACHE.keys()):
-        if now - SEARCH_CACHE[k]["ts"] > CACHE_TTL:
-            SEARCH_CACHE.pop(k, None)
-
-
 def _btn_text(s: str) -> str:
     s = (s or "").replace("\n", " ").strip()
     if len(s) > 60:
@@ -34,21 +28,36 @@ def _btn_text(s: str) -> str:
     return s or "🎬 Kino"
 
 
-def build_keyboard(token: str, page: int, items: list[dict]) -> types.InlineKeyboardMarkup:
+def _prune(session: SearchSession) -> None:
+    # katalogdan o'chirilganlar (change-feed) sessiyadan tashlanadi;
+    # faqat katalogda o'chirish bo'lgandan keyin qayta tekshiriladi
+    if session.checked != CATALOG.removals:
+        session.prune(lambda mid: CATALOG.by_id(mid) is not None)
+        session.checked = CATALOG.removals
+
+
+def build_keyboard(token: str, page: int, session: SearchSession) -> types.InlineKeyboardMarkup:
+    """
+    Sessiya -> klaviatura. Title render paytida katalogdan olinadi,
+    callback_data'da katalog row id (movies.id) -> movie_callback'da O(1).
+    """
     builder = InlineKeyboardBuilder()
     start = page * PAGE_SIZE
     end = start + PAGE_SIZE
 
-    for it in items[start:end]:
+    for mid in session.page(start, end):
+        e = CATALOG.by_id(mid)
+        if e is None:
+            continue
         builder.button(
-            text=_btn_text(it.get("title", "")),
-            callback_data=f"movie:{token}:{it['message_id']}"
+            text=_btn_text(e.title),
+            callback_data=f"movie:{token}:{mid}"
         )
 
     nav = InlineKeyboardBuilder()
     if page > 0:
         nav.button(text="⬅️ Prev", callback_data=f"nav:{token}:{page-1}")
-    if end < len(items):
+    if end < len(session):
         nav.button(text="Next ➡️", callback_data=f"nav:{token}:{page+1}")
 
     if nav.buttons:
@@ -58,16 +67,98 @@ def build_keyboard(token: str, page: int, items: list[dict]) -> types.InlineKeyb
     return builder.as_markup()
 
 
-@router.message(F.text & ~F.text.startswith("/"))
-async def search_movie(message: types.Message):
-    if not await has_access(message.from_user.id):
-        await message.answer("⛔ Sizda ruxsat yo‘q. Admin bilan bog‘laning.")
-        return
+async def _send_single(message: types.Message, it: dict) -> bool:
+    ok = await safe_copy_with_ttl(
+        bot=message.bot,
+        chat_id=message.from_user.id,
+        from_chat_id=int(it["channel_id"]),
+        message_id=int(it["message_id"]),
+        ttl_sec=TTL,
+        protect=True,
+        disable_notification=True,
+    )
+
+    if ok:
+        await message.answer(f"⏳ Bu kino {TTL_HOURS} soatdan keyin o‘chiriladi")
+        return True
+
+    # o‘chgan bo‘lsa DBdan ham o‘chiramiz
+    try:
+        await delete_movie_by_message_id(
+            message_id=int(it["message_id"]),
+            channel_id=int(it["channel_id"])
+        )
+    except Exception:
+        logger.exception("delete failed")
+    return False
+
+
+_B36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
 
-    # cache cleanup (light)
-    if int(time.time()) % 10 == 0:
-        _cleanup_cache()
+def _encode_token(n: int) -> str:
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = _B36[r] + out
+        if n == 0:
+            return out
 
+
+def _decode_token(token: str) -> int | None:
+    try:
+        return int(token, 36)
+    except ValueError:
+        return None
+
+
+async def _new_session(session: SearchSession) -> str:
+    """
+    Bir sahifadan ko'p natija (nav tugmalari bor) bo'lsa ro'yxat DBga
+    (search_sessions) yoziladi, callback_data'da faqat qisqa base36 id bo'ladi
+    -> restartdan keyin ham, boshqa processda ham ishlaydi (katalog processlar
+    o'rtasida LISTEN/NOTIFY bilan sinxron: start_catalog_sync).
+    Bitta sahifalik natijalar uchun INSERT yo'q: faqat xotiradagi "~" token.
+    Xotirada esa faqat SearchSession (user_id + array('I')) saqlanadi.
+    """
+    token = None
+    if len(session) > PAGE_SIZE:
+        try:
+            sid = await save_search_session(user_id=session.user_id, movie_ids=list(session.ids))
+            token = _encode_token(sid)
+        except Exception:
+            logger.exception("save_search_session failed, memory-only token")
+    if token is None:
+        token = "~" + uuid.uuid4().hex[:10]
+
+    SEARCH_CACHE.put(token, session, ttl=CACHE_TTL)
+    return token
+
+
+async def _load_session(token: str, user_id: int) -> SearchSession | None:
+    data = SEARCH_CACHE.get(token)
+
+    if data is None and not token.startswith("~"):
+        sid = _decode_token(token)
+        row = None
+        if sid is not None:
+            try:
+                row = await get_search_session(sid)
+            except Exception:
+                logger.exception("get_search_session failed: token=%s", token)
+        if row:
+            data = SearchSession(row["user_id"], row["movie_ids"] or ())
+            SEARCH_CACHE.put(token, data, ttl=CACHE_TTL)
+
+    if data is None or data.user_id != user_id:
+        return None
+    _prune(data)
+    return data if len(data) else None
+
+
+@router.message(F.text & ~F.text.startswith("/"))
+async def search_movie(message: types.Message):
+    # access middlewares.access.AccessMiddleware'da tekshirilgan
     query = (message.text or "").strip()
     if len(query) > 80 or "\n" in query:
         await message.answer("🔎 Kino nomini qisqa yozing (masalan: Shazam)")
@@ -76,21 +167,18 @@ async def search_movie(message: types.Message):
     # episode parse
     m = re.match(r"^(.*?)(?:\s+(\d{1,3}))?$", query)
     base = (m.group(1) or "").strip() if m else query
-    episode = m.group(2) if m else None
-
-    # ✅ async function
-    items = await find_top_movies(base)
+    episode = int(m.group(2)) if m and m.group(2) else None
 
-    if items and episode:
-        epn = int(episode)
+    # "Title N": aniq epizod bo'lsa fuzzy'siz darrov yuboramiz
+    if episode is not None:
+        hit = find_episode(base, episode)
+        if hit and await _send_single(message, hit):
+            return
 
-        def ep_match(it: dict):
-            _, e = extract_episode(it.get("title", ""))
-            return 0 if e == epn else 1
+    # ✅ katalog row id lar (natija cache'dan, userlar orasida umumiy)
+    ids = await search_movie_ids(base, episode)
 
-        items.sort(key=ep_match)
-
-    if not items:
+    if not ids:
         kb = InlineKeyboardBuilder()
         kb.button(text="🎬 Kanalga o‘tish", url="https://t.me/Trailer_kino_MOZ")
         kb.button(text="👤 Adminga yozish", url="https://t.me/Mozcyberr")
@@ -109,49 +197,23 @@ async def search_movie(message: types.Message):
 
         return
     # agar bitta bo‘lsa darrov yuboramiz
-    if len(items) == 1:
-        it = items[0]
-        ok = await safe_copy_with_ttl(
-            bot=message.bot,
-            chat_id=message.from_user.id,
-            from_chat_id=int(it["channel_id"]),
-            message_id=int(it["message_id"]),
-            ttl_sec=TTL,
-            protect=True,
-            disable_notification=True,
-        )
-
-        if ok:
-            await message.answer(f"⏳ Bu kino {TTL_HOURS} soatdan keyin o‘chiriladi")
-        else:
-            # o‘chgan bo‘lsa DBdan ham o‘chiramiz
-            try:
-                await delete_movie_by_message_id(
-                    message_id=int(it["message_id"]),
-                    channel_id=int(it["channel_id"])
-                )
-            except Exception:
-                logger.exception("delete failed")
+    if len(ids) == 1:
+        single = items_by_ids(ids)
+        if not single or not await _send_single(message, single[0]):
             await message.answer("❌ Bu kino o‘chirilgan.")
-    token = uuid.uuid4().hex[:10]
-    SEARCH_CACHE[token] = {
-        "user_id": message.from_user.id,
-        "items": items,
-        "ts": time.time()
-    }
+    session = SearchSession(message.from_user.id, ids)
+    token = await _new_session(session)
 
-    total_pages = (len(items) - 1) // PAGE_SIZE + 1
+    total_pages = (len(ids) - 1) // PAGE_SIZE + 1
 
     await message.answer(
-        f"🎬 Topildi: {len(items)} ta (1/{total_pages})\n"
+        f"🎬 Topildi: {len(ids)} ta (1/{total_pages})\n"
         f"⏳ Har bir kino {TTL_HOURS} soatdan keyin o‘chiriladi",
-        reply_markup=build_keyboard(token, 0, items)
+        reply_markup=build_keyboard(token, 0, session)
     )
 
 @router.callback_query(F.data.startswith("nav:"))
 async def nav_callback(call: types.CallbackQuery):
-    _cleanup_cache()
-
     try:
         _, token, page_s = call.data.split(":")
         page = int(page_s)
@@ -159,13 +221,12 @@ async def nav_callback(call: types.CallbackQuery):
         await call.answer("Xatolik", show_alert=True)
         return
 
-    data = SEARCH_CACHE.get(token)
-    if not data or data["user_id"] != call.from_user.id:
+    data = await _load_session(token, call.from_user.id)
+    if not data:
         await call.answer("Eskirgan", show_alert=True)
         return
 
-    items = data["items"]
-    total_pages = (len(items) - 1) // PAGE_SIZE + 1
+    total_pages = (len(data) - 1) // PAGE_SIZE + 1
 
     if page < 0 or page >= total_pages:
         await call.answer("Noto‘g‘ri sahifa", show_alert=True)
@@ -173,8 +234,8 @@ async def nav_callback(call: types.CallbackQuery):
 
     try:
         await call.message.edit_text(
-            f"🎬 Topildi: {len(items)} ta ({page+1}/{total_pages})",
-            reply_markup=build_keyboard(token, page, items)
+            f"🎬 Topildi: {len(data)} ta ({page+1}/{total_pages})",
+            reply_markup=build_keyboard(token, page, data)
         )
     except TelegramBadRequest:
         pass
@@ -184,24 +245,20 @@ async def nav_callback(call: types.CallbackQuery):
 
 @router.callback_query(F.data.startswith("movie:"))
 async def movie_callback(call: types.CallbackQuery):
-    _cleanup_cache()
-
     try:
-        _, token, msg_s = call.data.split(":")
-        msg_id = int(msg_s)
+        _, token, mid_s = call.data.split(":")
+        movie_id = int(mid_s)
     except:
         await call.answer("Xatolik", show_alert=True)
         return
 
-    data = SEARCH_CACHE.get(token)
-    if not data or data["user_id"] != call.from_user.id:
+    data = await _load_session(token, call.from_user.id)
+    if not data:
         await call.answer("Eskirgan", show_alert=True)
         return
 
-    item = next(
-        (it for it in data["items"] if int(it["message_id"]) == msg_id),
-        None
-    )
+    pos = data.live_index(movie_id)
+    item = CATALOG.by_id(movie_id) if pos is not None else None
 
     if not item:
         await call.answer("Topilmadi", show_alert=True)
@@ -210,8 +267,8 @@ async def movie_callback(call: types.CallbackQuery):
     ok = await safe_copy_with_ttl(
         bot=call.message.bot,
         chat_id=call.from_user.id,
-        from_chat_id=int(item["channel_id"]),
-        message_id=msg_id,
+        from_chat_id=item.channel_id,
+        message_id=item.message_id,
         ttl_sec=6 * 60 * 60,
         protect=True,
         disable_notification=True,
@@ -224,28 +281,27 @@ async def movie_callback(call: types.CallbackQuery):
     # o‘chgan bo‘lsa DBdan ham o‘chiramiz
     try:
         await delete_movie_by_message_id(
-            message_id=msg_id,
-            channel_id=int(item["channel_id"])
+            message_id=item.message_id,
+            channel_id=item.channel_id
         )
     except:
         logger.exception("delete failed")
 
-    # cache update
-    data["items"] = [
-        it for it in data["items"]
-        if int(it["message_id"]) != msg_id
-    ]
+    # tombstone (ids ResultCache bilan umumiy, ko'chirilmaydi)
+    data.discard(movie_id)
+    SEARCH_CACHE.put(token, data, ttl=CACHE_TTL)  # hajm qayta hisoblansin
 
-    if not data["items"]:
+    if not len(data):
         await call.message.edit_text("❌ Kinolar qolmadi")
         await call.answer("O‘chirilgan", show_alert=True)
         return
 
-    total_pages = (len(data["items"]) - 1) // PAGE_SIZE + 1
+    total_pages = (len(data) - 1) // PAGE_SIZE + 1
+    page = min(pos // PAGE_SIZE, total_pages - 1)
 
     await call.message.edit_text(
-        f"🎬 Qoldi: {len(data['items'])} ta (1/{total_pages})",
-        reply_markup=build_keyboard(token, 0, data["items"])
+        f"🎬 Qoldi: {len(data)} ta ({page+1}/{total_pages})",
+        reply_markup=build_keyboard(token, page, data)
     )
 
     await call.answer("❌ Kino o‘chirilgan", show_alert=True)
\ No newline at end of file
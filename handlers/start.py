@@ -3,7 +3,6 @@ from aiogram import Router, F, types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters import CommandStart
 
-from db.access import has_access
 from db.users import upsert_user
 from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest, TelegramRetryAfter
 import asyncio
@@ -20,7 +19,7 @@ def request_access_kb() -> types.InlineKeyboardMarkup:
 
 
 @router.message(CommandStart())
-async def start_cmd(message: types.Message):
+async def start_cmd(message: types.Message, has_access: bool = False):
     user = message.from_user
     user_id = int(user.id)
     username = user.username or None
@@ -37,13 +36,8 @@ async def start_cmd(message: types.Message):
         f"🆔 Sizning ID: {user_id}\n\n"
     )
 
-    try:
-        allowed = await has_access(user_id)
-    except Exception:
-        logger.exception("has_access failed, defaulting to no-access")
-        allowed = False
-
-    if allowed:
+    # has_access: AccessMiddleware bir marta aniqlagan (cache orqali)
+    if has_access:
         await message.answer(
             base_text +
             "✅ Sizda ruxsat bor.\n"
@@ -0,0 +1,100 @@
+# middlewares/access.py
+from __future__ import annotations
+
+import logging
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from db.access import has_access
+
+logger = logging.getLogger(__name__)
+
+DENY_TEXT = "⛔ Sizda ruxsat yo‘q. Admin bilan bog‘laning."
+
+
+class AccessMiddleware(BaseMiddleware):
+    """
+    Outer middleware (message + callback_query): har bir update uchun access
+    bir marta (cache'langan has_access orqali) aniqlanadi va data["has_access"]
+    ga qo'yiladi. Ruxsatsiz user filter/handlerlarga yetib bormaydi, faqat
+    /start, "access:request" va "sub:info" (obunasi tugaganlar uchun ham) ochiq.
+    Adminlar bloklanmaydi, lekin has_access ularning haqiqiy obunasini bildiradi.
+    """
+
+    def __init__(
+        self,
+        *,
+        admin_ids: Iterable[int],
+        open_commands: Iterable[str] = ("/start",),
+        open_callbacks: Iterable[str] = ("access:request", "sub:info"),
+    ) -> None:
+        self.admin_ids = frozenset(int(x) for x in admin_ids)
+        self.open_commands = tuple(open_commands)
+        self.open_callbacks = frozenset(open_callbacks)
+
+        self.allowed = 0
+        self.denied = 0
+        self.errors = 0
+
+    def _is_open(self, event: TelegramObject) -> bool:
+        if isinstance(event, Message):
+            parts = (event.text or "").split(maxsplit=1)
+            return bool(parts) and parts[0].split("@", 1)[0] in self.open_commands
+        if isinstance(event, CallbackQuery):
+            return event.data in self.open_callbacks
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            data["has_access"] = False
+            return await handler(event, data)
+
+        try:
+            allowed = await has_access(user.id)
+        except Exception:
+            logger.exception("has_access failed, defaulting to no-access: user=%s", user.id)
+            self.errors += 1
+            allowed = False
+
+        data["has_access"] = allowed
+        if user.id in self.admin_ids:
+            # admin bypass alohida: handlerlar uchun has_access o'zgarmaydi
+            return await handler(event, data)
+        if allowed:
+            self.allowed += 1
+            return await handler(event, data)
+        if self._is_open(event):
+            return await handler(event, data)
+
+        # ✅ routing/parsinggacha to'xtatamiz
+        self.denied += 1
+        try:
+            if isinstance(event, Message) and event.text:
+                await event.answer(DENY_TEXT)
+            elif isinstance(event, CallbackQuery):
+                await event.answer(DENY_TEXT, show_alert=True)
+        except Exception:
+            logger.warning("access deny reply failed: user=%s", user.id)
+        return None
+
+    def stats(self) -> dict[str, int]:
+        return {"allowed": self.allowed, "denied": self.denied, "errors": self.errors}
+
+
+ACCESS_MIDDLEWARE: AccessMiddleware | None = None
+
+
+def setup_access_middleware(dp, *, admin_ids: Iterable[int]) -> AccessMiddleware:
+    global ACCESS_MIDDLEWARE
+    ACCESS_MIDDLEWARE = AccessMiddleware(admin_ids=admin_ids)
+    dp.message.outer_middleware(ACCESS_MIDDLEWARE)
+    dp.callback_query.outer_middleware(ACCESS_MIDDLEWARE)
+    return ACCESS_MIDDLEWARE
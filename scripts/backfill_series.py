@@ -0,0 +1,39 @@
+import asyncio
+
+from db.core import init_pool, get_pool
+from utils.text import series_info
+
+BATCH = 500
+
+async def main():
+    # ✅ poolni init qilamiz (DATABASE_URL env bo‘lishi shart)
+    await init_pool()
+
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT channel_id, message_id, COALESCE(title_raw,title) AS t
+            FROM movies
+            WHERE series_key IS NULL
+        """)
+        print("movies to fix:", len(rows))
+
+        for i in range(0, len(rows), BATCH):
+            batch = rows[i:i+BATCH]
+            args = []
+            for r in batch:
+                skey, season, episode = series_info(r["t"])
+                args.append((skey, season, episode, int(r["channel_id"]), int(r["message_id"])))
+
+            async with conn.transaction():
+                await conn.executemany("""
+                    UPDATE movies
+                    SET series_key=$1, season=$2, episode=$3
+                    WHERE channel_id=$4 AND message_id=$5
+                """, args)
+            print(f"movies updated: {min(i+BATCH, len(rows))}/{len(rows)}")
+
+    print("✅ Done.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
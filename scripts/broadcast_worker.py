@@ -0,0 +1,31 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+
+from config import TOKEN
+from db import init_db
+from db.core import init_pool
+from service.broadcast_jobs import start_broadcast_worker
+
+# Alohida broadcast worker: polling yo'q, faqat broadcast_shards lease qiladi.
+# Bir nechta nusxa ishga tushirilsa shardlar ular o'rtasida bo'linadi,
+# BROADCAST_RATE esa barcha workerlar uchun umumiy qoladi.
+# python -m scripts.broadcast_worker
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    await init_pool(min_size=1, max_size=5)
+    await init_db()
+
+    bot = Bot(token=TOKEN)
+    worker = start_broadcast_worker(bot)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+        await bot.session.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
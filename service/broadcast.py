@@ -0,0 +1,297 @@
+# service/broadcast.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+
+from config import BROADCAST_RATE, BROADCAST_WORKERS
+from db.broadcast import set_users_blocked
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Global limiter: `rate` token/sekund, `burst` gacha yig'iladi.
+    pause(sec) -> butun bucket to'xtaydi (TelegramRetryAfter hamma uchun).
+    acquire() lock ostida -> navbat FIFO.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = max(0.1, float(rate))
+        self.capacity = max(1.0, float(burst if burst is not None else self.rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + float(seconds))
+        self._tokens = 0.0
+
+    def set_rate(self, rate: float) -> None:
+        """Global budjet bir nechta process o'rtasida bo'linganda (shard lease'lar)."""
+        self.rate = max(0.1, float(rate))
+        self.capacity = max(1.0, self.rate)
+        self._tokens = min(self._tokens, self.capacity)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChatLimiter:
+    """Bitta chatga `interval` sekundda 1 ta xabar (Telegram per-chat limiti)."""
+
+    def __init__(self, interval: float = 1.0) -> None:
+        self.interval = float(interval)
+        self._next: dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now = time.monotonic()
+        if len(self._next) > 10_000:
+            self._next = {k: t for k, t in self._next.items() if t > now}
+
+        at = max(now, self._next.get(chat_id, 0.0))
+        self._next[chat_id] = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class BlockedBuffer:
+    """
+    Bloklagan userlar bufferi: har bir Forbidden uchun alohida UPDATE o'rniga
+    max_ids ta yig'ilganda yoki interval sekund o'tganda bitta
+    UPDATE ... WHERE user_id = ANY($1). run() oxirida flush() majburiy.
+    """
+
+    def __init__(self, *, max_ids: int = 200, interval: float = 5.0) -> None:
+        self.max_ids = max(1, int(max_ids))
+        self.interval = float(interval)
+        self._ids: list[int] = []
+        self._last_flush = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def add(self, user_id: int) -> None:
+        self._ids.append(int(user_id))
+        if len(self._ids) >= self.max_ids:
+            await self.flush()
+        else:
+            await self.flush_if_due()
+
+    async def flush_if_due(self) -> None:
+        if self._ids and time.monotonic() - self._last_flush >= self.interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        ids, self._ids = self._ids, []
+        self._last_flush = time.monotonic()
+        if not ids:
+            return
+        try:
+            await set_users_blocked(ids)
+        except Exception:
+            logger.exception("set_users_blocked failed: %d ids", len(ids))
+
+
+@dataclass(slots=True)
+class BroadcastStats:
+    total: int | None = None
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    retry_after: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self) -> float:
+        """Throughput (xabar/sekund)."""
+        e = self.elapsed
+        return self.done / e if e > 0 else 0.0
+
+
+ProgressCallback = Callable[[BroadcastStats], Awaitable[None]]
+ResultCallback = Callable[[int, bool], Awaitable[None]]
+
+
+class BroadcastEngine:
+    """
+    copy_message broadcast: N ta parallel sender, bitta global TokenBucket
+    (Telegram ~30 msg/s) + per-chat limiter orqasida.
+
+      TelegramRetryAfter      -> butun bucket retry_after ga to'xtaydi, user qayta yuboriladi
+      Forbidden / BadRequest  -> failed + BlockedBuffer (bulk is_blocked, bloklagan / o'chirilgan)
+      on_progress(stats)      -> har progress_every sekundda va oxirida
+      on_result(uid, ok)      -> har bir recipientdan keyin (job progress markeri uchun)
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float = BROADCAST_RATE,
+        workers: int = BROADCAST_WORKERS,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+    ) -> None:
+        self.bucket = TokenBucket(rate)
+        self.chats = ChatLimiter(per_chat_interval)
+        self.workers = max(1, int(workers))
+        self.max_retries = max(0, int(max_retries))
+
+    async def run(
+        self,
+        bot,
+        user_ids: Iterable[int],
+        *,
+        from_chat_id: int,
+        message_id: int,
+        on_progress: ProgressCallback | None = None,
+        on_result: ResultCallback | None = None,
+        progress_every: float = 5.0,
+        stats: BroadcastStats | None = None,
+        stop: asyncio.Event | None = None,
+    ) -> BroadcastStats:
+        """
+        stop set bo'lsa (masalan shard lease yo'qoldi) yangi yuborish boshlanmaydi:
+        har bir copy_message oldidan tekshiriladi, yuborilmaganlarga on_result chaqirilmaydi.
+        """
+        if stats is None:
+            stats = BroadcastStats(total=len(user_ids) if hasattr(user_ids, "__len__") else None)
+        stats.finished_at = None  # bir nechta run() ga bitta stats berilishi mumkin
+        next_uid = _shared_next(user_ids)
+        blocked = BlockedBuffer()
+
+        async def sender() -> None:
+            # iterator umumiy: har bir uid bitta senderga tushadi
+            while (stop is None or not stop.is_set()) and (uid := await next_uid()) is not None:
+                ok = await self._send_one(bot, stats, blocked, int(uid), from_chat_id, message_id, stop)
+                if ok is None:
+                    return  # to'xtatildi, uid yuborilmadi
+                if on_result is not None:
+                    try:
+                        await on_result(int(uid), ok)
+                    except Exception:
+                        logger.exception("broadcast on_result failed uid=%s", uid)
+
+        reporter = None
+        if on_progress is not None:
+            reporter = asyncio.create_task(self._report(stats, on_progress, progress_every))
+
+        try:
+            await asyncio.gather(*(sender() for _ in range(self.workers)))
+        finally:
+            stats.finished_at = time.monotonic()
+            if reporter is not None:
+                reporter.cancel()
+            await blocked.flush()  # oxirgi bloklanganlar (job cursor commitidan oldin)
+
+        logger.info(
+            "Broadcast done: sent=%d failed=%d blocked=%d retry_after=%d %.1f msg/s in %.0fs",
+            stats.sent, stats.failed, stats.blocked, stats.retry_after, stats.rate, stats.elapsed,
+        )
+        if on_progress is not None:
+            await self._safe_progress(on_progress, stats)
+        return stats
+
+    async def _send_one(
+        self,
+        bot,
+        stats: BroadcastStats,
+        blocked: BlockedBuffer,
+        uid: int,
+        from_chat_id: int,
+        message_id: int,
+        stop: asyncio.Event | None = None,
+    ) -> bool | None:
+        """True/False -> yuborildi/yetmadi; None -> stop set, yuborilmadi."""
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            await self.chats.wait(uid)
+            if stop is not None and stop.is_set():
+                return None
+            try:
+                await bot.copy_message(chat_id=uid, from_chat_id=from_chat_id, message_id=message_id)
+                stats.sent += 1
+                return True
+
+            except TelegramRetryAfter as e:
+                stats.retry_after += 1
+                logger.warning("Broadcast floodwait: retry_after=%ss uid=%s", e.retry_after, uid)
+                self.bucket.pause(e.retry_after + 1)
+                continue
+
+            except (TelegramForbiddenError, TelegramBadRequest):
+                stats.failed += 1
+                stats.blocked += 1
+                await blocked.add(uid)  # 🔥 blok qilgan (bulk flush)
+                return False
+
+            except Exception as e:
+                stats.failed += 1
+                logger.exception("Broadcast error uid=%s err=%s", uid, e)
+                return False
+
+        stats.failed += 1
+        logger.error("Broadcast gave up after floodwaits uid=%s", uid)
+        return False
+
+    async def _report(self, stats: BroadcastStats, on_progress: ProgressCallback, every: float) -> None:
+        while True:
+            await asyncio.sleep(every)
+            await self._safe_progress(on_progress, stats)
+
+    @staticmethod
+    async def _safe_progress(on_progress: ProgressCallback, stats: BroadcastStats) -> None:
+        try:
+            await on_progress(stats)
+        except Exception:
+            logger.debug("broadcast progress callback failed", exc_info=True)
+
+
+def _shared_next(user_ids: Iterable[int]) -> Callable[[], Awaitable[int | None]]:
+    """Senderlar uchun umumiy "keyingi uid" (tugasa None)."""
+    it = iter(user_ids)
+
+    async def next_uid() -> int | None:
+        return next(it, None)
+    return next_uid
+
+
+# bitta process ichidagi barcha broadcastlar bitta bucketni bo'lishadi
+ENGINE = BroadcastEngine()
+
+
+def format_progress(stats: BroadcastStats) -> str:
+    total = stats.total if stats.total is not None else "?"
+    return f"📣 Yuborilyapti... {stats.done}/{total} ({stats.rate:.1f} msg/s)"
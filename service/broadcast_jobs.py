@@ -0,0 +1,292 @@
+# service/broadcast_jobs.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from config import BROADCAST_LEASE_SEC, BROADCAST_RATE, BROADCAST_SHARDS
+from db.broadcast import count_audience, iter_audience
+from db.broadcast_jobs import (
+    commit_shard_cursor,
+    count_broadcast_workers,
+    create_broadcast_job,
+    ensure_broadcast_shards,
+    finish_broadcast_shard,
+    get_delivered,
+    lease_broadcast_shard,
+    mark_deliveries,
+    renew_broadcast_lease,
+)
+from service.broadcast import ENGINE, BroadcastStats, format_progress
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500  # shard cursor'i shu hajmdagi bo'laklardan keyin commit qilinadi
+POLL_INTERVAL = 5.0  # bo'sh shard yo'q bo'lsa qayta tekshirish (sekund)
+
+
+async def start_broadcast_job(message, audience: str) -> int | None:
+    """
+    message.reply_to_message ni audience ("all" | "subs" | "unsubs") ga yuborish
+    jobini yaratadi (broadcast_jobs + BROADCAST_SHARDS ta shard). Shardlarni
+    BROADCAST_WORKER=1 bo'lgan processlar lease qilib yuboradi.
+    Audience bo'sh bo'lsa None.
+    """
+    src = message.reply_to_message
+    total = await count_audience(audience)
+    if not total:
+        return None
+
+    status = await message.answer(f"📣 Yuborilyapti... 0/{total}")
+    job = await create_broadcast_job(
+        admin_id=message.from_user.id,
+        from_chat_id=src.chat.id,
+        message_id=src.message_id,
+        audience=audience,
+        total=total,
+        shards=BROADCAST_SHARDS,
+        status_chat_id=status.chat.id,
+        status_message_id=status.message_id,
+    )
+    WORKER.wake()
+    return job["id"]
+
+
+async def _edit_status(bot, job: dict, text: str) -> None:
+    if not job.get("status_chat_id") or not job.get("status_message_id"):
+        return
+    try:
+        await bot.edit_message_text(
+            text=text,
+            chat_id=int(job["status_chat_id"]),
+            message_id=int(job["status_message_id"]),
+        )
+    except Exception:
+        pass
+
+
+def _job_stats(row: dict) -> BroadcastStats:
+    """Job counterlari (barcha shardlar) -> BroadcastStats (rate job boshidan hisoblanadi)."""
+    age = max(0.0, time.time() - int(row["created_at"]))
+    return BroadcastStats(
+        total=int(row["total"]),
+        sent=int(row["sent"]),
+        failed=int(row["failed"]),
+        started_at=time.monotonic() - age,
+    )
+
+
+class BroadcastWorker:
+    """
+    Broadcast shardlarini DB orqali lease qilib yuboradigan worker (process'da bitta).
+
+    - lease_broadcast_shard: FOR UPDATE SKIP LOCKED, bir vaqtda bitta shard
+    - heartbeat: lease_sec/3 da lease uzaytiriladi; uzaytirib bo'lmasa shard to'xtaydi
+    - global rate: BROADCAST_RATE lease ushlab turgan processlar soniga bo'linadi
+      (har lease va heartbeat'da qayta hisoblanadi)
+    - process o'lsa lease muddati o'tadi va shard boshqa workerga o'tadi,
+      shard cursor'i + delivery markerlaridan davom etadi (markerlar chunk
+      commit'siz to'xtaganda bulk yoziladi; process o'ldirilsa oxirgi
+      commit qilinmagan chunk qayta yuborilishi mumkin)
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float = BROADCAST_RATE,
+        lease_sec: int = BROADCAST_LEASE_SEC,
+        poll_interval: float = POLL_INTERVAL,
+    ) -> None:
+        self.rate = float(rate)
+        self.lease_sec = max(10, int(lease_sec))
+        self.poll_interval = float(poll_interval)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.shards_done = 0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self, bot) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(bot), name="broadcast-worker")
+
+    def wake(self) -> None:
+        """Yangi job yaratildi -> poll_interval kutmasdan lease qilishga urinadi."""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, bot) -> None:
+        try:
+            n = await ensure_broadcast_shards()
+            if n:
+                logger.info("Broadcast: %d old job(s) moved to shards", n)
+        except Exception:
+            logger.exception("ensure_broadcast_shards failed")
+
+        logger.info("Broadcast worker started: owner=%s", self.owner)
+        while True:
+            self._wake.clear()
+            try:
+                lease = await lease_broadcast_shard(self.owner, self.lease_sec)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("lease_broadcast_shard failed")
+                lease = None
+
+            if lease is not None:
+                await self._run_shard(bot, lease)
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh_rate(self) -> None:
+        workers = await count_broadcast_workers()
+        ENGINE.bucket.set_rate(self.rate / max(1, workers))
+
+    async def _heartbeat(self, lease: dict, lost: asyncio.Event) -> None:
+        # lease shu vaqtgacha bizda deb hisoblanadi (oxirgi muvaffaqiyatli renew)
+        held_until = time.monotonic() + self.lease_sec
+        while True:
+            await asyncio.sleep(self.lease_sec / 3)
+            try:
+                ok = await renew_broadcast_lease(lease["job_id"], lease["shard"], self.owner, self.lease_sec)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("renew_broadcast_lease failed job=%s shard=%s", lease["job_id"], lease["shard"])
+                # keyingi urinishgacha muddat o'tib ketishi mumkin -> boshqa worker olishidan oldin to'xtaymiz
+                if time.monotonic() + self.lease_sec / 3 >= held_until:
+                    lost.set()
+                    return
+                continue
+            if not ok:
+                lost.set()
+                return
+            held_until = time.monotonic() + self.lease_sec
+            try:
+                await self._refresh_rate()
+            except Exception:
+                pass
+
+    async def _run_shard(self, bot, lease: dict) -> None:
+        """
+        Shard audience'i (user_id % shards = shard) CHUNK_SIZE lab, shard cursor'idan
+        keyin o'qiladi. Chunk natijalari xotirada yig'iladi va chunk tugagach shard
+        cursor'i + job counterlari bilan bitta so'rovda commit qilinadi (faqat lease
+        bizda bo'lsa). Lease yo'qolsa (lost) engine har yuborish oldidan to'xtaydi,
+        yig'ilgan natijalar bulk delivery markeri bo'lib yoziladi -> yangi egasi
+        markerlardan davom etadi, takror yo'q.
+        """
+        job_id, shard, shards = int(lease["job_id"]), int(lease["shard"]), int(lease["shards"])
+        cursor = int(lease["cursor"])
+        stats = BroadcastStats()  # faqat shu shard (log uchun)
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(lease, lost))
+
+        results: list[tuple[int, bool]] = []  # joriy chunk
+
+        async def on_result(uid: int, ok: bool) -> None:
+            results.append((uid, ok))
+
+        async def save_markers() -> None:
+            # commit'siz to'xtadik: yuborilganlar keyingi egasida qayta yuborilmasin
+            try:
+                await mark_deliveries(job_id, results)
+            except Exception:
+                logger.exception("Broadcast job=%s shard=%s: mark_deliveries failed", job_id, shard)
+
+        logger.info("Broadcast job=%s shard=%s/%s leased, cursor=%s", job_id, shard, shards, cursor)
+        try:
+            await self._refresh_rate()
+            async for page in iter_audience(
+                lease["audience"], after=cursor, chunk=CHUNK_SIZE, shards=shards, shard=shard
+            ):
+                if lost.is_set():
+                    logger.warning("Broadcast job=%s shard=%s: lease lost at cursor=%s", job_id, shard, cursor)
+                    return
+
+                delivered = await get_delivered(job_id, page)
+                todo = [uid for uid in page if uid not in delivered]
+                if todo:
+                    await ENGINE.run(
+                        bot,
+                        todo,
+                        from_chat_id=int(lease["from_chat_id"]),
+                        message_id=int(lease["message_id"]),
+                        on_result=on_result,
+                        stats=stats,
+                        stop=lost,
+                    )
+                if lost.is_set():
+                    # chunk oxirigacha yuborilmagan: cursor surilmaydi
+                    logger.warning("Broadcast job=%s shard=%s: lease lost at cursor=%s", job_id, shard, cursor)
+                    await save_markers()
+                    return
+
+                row = await commit_shard_cursor(job_id, shard, shards, page[-1], self.owner, results)
+                if row is None:
+                    logger.warning("Broadcast job=%s shard=%s: lease lost at cursor=%s", job_id, shard, cursor)
+                    await save_markers()
+                    return
+                results.clear()  # commit qilindi: markerga yozilmasin
+                cursor = page[-1]
+                await _edit_status(bot, lease, format_progress(_job_stats(row)))
+
+            owned, job = await finish_broadcast_shard(job_id, shard, self.owner)
+        except asyncio.CancelledError:
+            await save_markers()
+            raise  # lease muddati o'tgach shard boshqa workerga o'tadi
+        except Exception:
+            logger.exception("Broadcast job=%s shard=%s failed at cursor=%s (lease will expire)", job_id, shard, cursor)
+            await save_markers()
+            return
+        finally:
+            heartbeat.cancel()
+
+        if not owned:
+            logger.warning("Broadcast job=%s shard=%s: lease lost before finish", job_id, shard)
+            return
+        self.shards_done += 1
+        logger.info(
+            "Broadcast job=%s shard=%s done: sent=%s failed=%s (%.1f msg/s)",
+            job_id, shard, stats.sent, stats.failed, stats.rate,
+        )
+        if job is None:
+            return  # boshqa shardlar hali ishlayapti
+
+        s = _job_stats(job)
+        s.finished_at = s.started_at + max(0, int(job["finished_at"]) - int(job["created_at"]))
+        logger.info("Broadcast job=%s done: sent=%s failed=%s", job_id, s.sent, s.failed)
+        await _edit_status(
+            bot,
+            lease,
+            f"✅ Broadcast tugadi\n\n"
+            f"📨 Yuborildi: {s.sent}\n"
+            f"❌ Yetmadi: {s.failed}\n"
+            f"👥 Jami: {s.total}\n"
+            f"⚡ {s.rate:.1f} msg/s, {int(s.elapsed)} s",
+        )
+
+
+# process'dagi yagona worker (BROADCAST_WORKER=1 bo'lsa bot.py start qiladi)
+WORKER = BroadcastWorker()
+
+
+def start_broadcast_worker(bot) -> BroadcastWorker:
+    WORKER.start(bot)
+    return WORKER
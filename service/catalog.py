@@ -0,0 +1,280 @@
+# service/catalog.py
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass, field
+
+from db.movies import MovieEvent, fetch_catalog, listen_movie_changes, subscribe
+from db.utils import normalize
+from service.token_index import TokenIndex
+from utils.text import series_info
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CatalogEntry:
+    id: int
+    channel_id: int
+    message_id: int
+    title: str
+    title_norm: str
+    created_at: int
+    aliases: list[str] = field(default_factory=list)  # alias_norm lar
+    series_key: str | None = None                      # ingest paytida hisoblangan
+    season: int | None = None
+    episode: int | None = None
+    title_key: str = field(init=False, default="")     # fuzzy scoring uchun, bir marta
+
+    def __post_init__(self) -> None:
+        self.title_key = self.title_norm or normalize(self.title).strip()
+        if self.series_key is None:
+            # backfill qilinmagan eski qator
+            self.series_key, self.season, self.episode = series_info(self.title)
+
+    @property
+    def episode_order(self) -> tuple[int, int, int]:
+        return (
+            self.season or 0,
+            self.episode if self.episode is not None else 10**9,
+            len(self.title),
+        )
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return self.channel_id, self.message_id
+
+    def texts(self):
+        yield self.title_norm
+        yield from self.aliases
+
+
+class CatalogIndex:
+    """
+    movies + movie_aliases ning xotiradagi nusxasi.
+    Startupda bir marta yuklanadi, qidiruv DBga tegmasdan shu yerdan javob beradi.
+    """
+
+    def __init__(self) -> None:
+        self._by_key: dict[tuple[int, int], CatalogEntry] = {}
+        self._by_id: dict[int, CatalogEntry] = {}  # movies.id -> entry (sessiyalar uchun)
+        self._tokens = TokenIndex()
+        # (series_key, episode) -> kino kalitlari ("Title N" so'rovlari uchun O(1))
+        self._episodes: dict[tuple[str, int], set[tuple[int, int]]] = {}
+        # latest() natijasi (created_at desc); har yozuvda bekor qilinadi
+        self._latest: list[CatalogEntry] | None = None
+        # remove()/load() soni: sessiyalar shu o'zgargandagina qayta filtrlanadi
+        self.removals = 0
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def get(self, channel_id: int, message_id: int) -> CatalogEntry | None:
+        return self._by_key.get((int(channel_id), int(message_id)))
+
+    def by_id(self, movie_id: int) -> CatalogEntry | None:
+        return self._by_id.get(int(movie_id))
+
+    def load(self, movies: list[dict], aliases: list[dict]) -> None:
+        by_key: dict[tuple[int, int], CatalogEntry] = {}
+        for r in movies:
+            e = _entry_from_row(r)
+            by_key[e.key] = e
+
+        for a in aliases:
+            e = by_key.get((int(a["channel_id"]), int(a["message_id"])))
+            if e is not None:
+                e.aliases.append(a["alias_norm"] or "")
+
+        tokens = TokenIndex()
+        for e in by_key.values():
+            for n in e.texts():
+                tokens.add(e.key, n)
+
+        self._by_key = by_key
+        self._by_id = {e.id: e for e in by_key.values() if e.id}
+        self._tokens = tokens
+        self._episodes = {}
+        for e in by_key.values():
+            self._link_episode(e)
+        self._latest = None
+        self.removals += 1
+        self.loaded = True
+
+    def upsert(self, entry: CatalogEntry) -> None:
+        self.remove(*entry.key)
+        self._by_key[entry.key] = entry
+        if entry.id:
+            self._by_id[entry.id] = entry
+        for n in entry.texts():
+            self._tokens.add(entry.key, n)
+        self._link_episode(entry)
+        self._latest = None
+
+    def remove(self, channel_id: int, message_id: int) -> CatalogEntry | None:
+        key = (int(channel_id), int(message_id))
+        self._tokens.remove_owner(key)
+        old = self._by_key.pop(key, None)
+        if old is not None:
+            self._latest = None
+            self.removals += 1
+        if old is not None and self._by_id.get(old.id) is old:
+            del self._by_id[old.id]
+        if old is not None and old.series_key and old.episode is not None:
+            keys = self._episodes.get((old.series_key, old.episode))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._episodes[(old.series_key, old.episode)]
+        return old
+
+    def _link_episode(self, e: CatalogEntry) -> None:
+        if e.series_key and e.episode is not None:
+            self._episodes.setdefault((e.series_key, e.episode), set()).add(e.key)
+
+    def apply(self, event: MovieEvent) -> None:
+        """db.movies change-feed eventini indeksga qo'llaydi (to'liq reload'siz)."""
+        if event.kind == "delete":
+            self.remove(event.channel_id, event.message_id)
+            return
+
+        old = self.get(event.channel_id, event.message_id)
+        if event.kind == "alias":
+            if old is not None:
+                for a in event.aliases:
+                    if a not in old.aliases:
+                        old.aliases.append(a)
+                        self._tokens.add(old.key, a)
+            return
+
+        # upsert: ON CONFLICT DO NOTHING -> eski aliaslar saqlanadi
+        aliases = list(old.aliases) if old is not None else []
+        aliases.extend(a for a in event.aliases if a not in aliases)
+        self.upsert(CatalogEntry(
+            id=event.id,
+            channel_id=event.channel_id,
+            message_id=event.message_id,
+            title=event.title,
+            title_norm=event.title_norm,
+            created_at=event.created_at,
+            aliases=aliases,
+            series_key=event.series_key,
+            season=event.season,
+            episode=event.episode,
+        ))
+
+    def snapshot(self) -> tuple[list[dict], list[dict]]:
+        """load() bilan mos (movies, aliases) — boshqa processga yuborish uchun."""
+        movies, aliases = [], []
+        for e in self._by_key.values():
+            movies.append({
+                "id": e.id,
+                "channel_id": e.channel_id,
+                "message_id": e.message_id,
+                "title": e.title,
+                "title_norm": e.title_norm,
+                "created_at": e.created_at,
+                "series_key": e.series_key,
+                "season": e.season,
+                "episode": e.episode,
+            })
+            aliases.extend(
+                {"channel_id": e.channel_id, "message_id": e.message_id, "alias_norm": a}
+                for a in e.aliases
+            )
+        return movies, aliases
+
+    # -------- queries --------
+    def like(self, query: str, limit: int = 20) -> list[CatalogEntry]:
+        """
+        db.movies.get_movies_like bilan bir xil 3 bosqich (TokenIndex.search):
+          1) exact word (butun query so'z chegarasida)
+          2) word-start: har bir token biror so'z boshida
+          3) contains: har bir token substring
+        Natija DISTINCT ON kabi (channel_id, message_id) bo'yicha tartiblangan.
+        """
+        q = normalize(query).strip()
+        if not q:
+            return []
+
+        tokens = [t for t in q.split() if len(t) >= 2]
+        if not tokens:
+            return []
+
+        _, keys = self._tokens.search(q, tokens, limit)
+        return [self._by_key[k] for k in keys]
+
+    def find_episode(self, skey: str, episode: int) -> CatalogEntry | None:
+        """
+        (series_key, episode) bo'yicha aniq epizod.
+        Bir nechta season bo'lsa noaniq -> None (oddiy qidiruvga qaytiladi);
+        bitta season ichida dublikat bo'lsa eng yangisi.
+        """
+        keys = self._episodes.get((skey, int(episode)))
+        if not keys:
+            return None
+
+        entries = [self._by_key[k] for k in keys]
+        if len({e.season for e in entries}) > 1:
+            return None
+        return max(entries, key=lambda e: (e.created_at, e.key))
+
+    def latest(self, limit: int = 300) -> list[CatalogEntry]:
+        """
+        Eng yangi `limit` ta kino (created_at desc). To'liq sort o'rniga
+        heapq.nlargest (O(n log k)), natija keyingi yozuvgacha cache'da.
+        """
+        cached = self._latest
+        if cached is None or (len(cached) < limit and len(cached) < len(self._by_key)):
+            cached = self._latest = heapq.nlargest(limit, self._by_key.values(), key=_created_at)
+        return cached[:limit]
+
+
+def _created_at(e: CatalogEntry) -> int:
+    return e.created_at
+
+
+def _entry_from_row(r: dict) -> CatalogEntry:
+    return CatalogEntry(
+        id=int(r["id"]),
+        channel_id=int(r["channel_id"]),
+        message_id=int(r["message_id"]),
+        title=r["title"] or "",
+        title_norm=r["title_norm"] or "",
+        created_at=int(r["created_at"] or 0),
+        series_key=r.get("series_key"),
+        season=r.get("season"),
+        episode=r.get("episode"),
+    )
+
+
+CATALOG = CatalogIndex()
+subscribe(CATALOG.apply)
+
+
+async def load_catalog() -> CatalogIndex:
+    movies, aliases = await fetch_catalog()
+    CATALOG.load(movies, aliases)
+    logger.info("Catalog loaded: movies=%d aliases=%d", len(movies), len(aliases))
+    return CATALOG
+
+
+async def start_catalog_sync(timeout: float = 10.0) -> asyncio.Task:
+    """
+    LISTEN movie_events: boshqa bot processlarida ingest qilingan / o'chirilgan
+    kinolar ham shu processning CATALOG'iga tushadi (sessiyalar, callbacklar
+    uchun). load_catalog'dan oldin chaqiriladi -> oraliqdagi yozuvlar yo'qolmaydi.
+    """
+    ready = asyncio.Event()
+    task = asyncio.create_task(
+        listen_movie_changes(ready=ready, on_reconnect=load_catalog),
+        name="catalog-sync",
+    )
+    try:
+        await asyncio.wait_for(ready.wait(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Catalog sync: LISTEN not ready after %.0fs, continuing", timeout)
+    return task
@@ -0,0 +1,283 @@
+# service/procpool.py
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+from multiprocessing.connection import Connection
+
+from config import SEARCH_PROCESS_TIMEOUT
+from db.movies import MovieEvent, subscribe, unsubscribe
+from service.catalog import CATALOG, CatalogIndex
+from service.scoring import ScoreRequest, ScoringEngine, is_short_query, short_query_matches
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# WORKER (alohida process)
+# =========================
+def rank_local(
+    index: CatalogIndex,
+    engine: ScoringEngine,
+    qn: str,
+    limit: int,
+    score_cutoff: int,
+) -> tuple[bool, list[tuple[tuple[int, int], int]]]:
+    """
+    find_top_movies ning sync nusxasi (kandidat + short guard + fuzzy).
+    Return: (short_query, [((channel_id, message_id), score), ...])
+    """
+    candidates = index.like(qn, limit=120)
+    if not candidates:
+        if len(qn) < 4:
+            return False, []
+        candidates = index.latest(300)
+
+    if is_short_query(qn):
+        return True, [(e.key, s) for e, s in short_query_matches(qn, candidates, limit)]
+
+    req = ScoreRequest(query=qn, candidates=candidates, limit=limit, score_cutoff=score_cutoff)
+    return False, [(e.key, s) for e, s in engine.score(req)]
+
+
+def _worker_main(conn: Connection, score_workers: int) -> None:
+    """
+    Xabarlar:
+      ("load", movies, aliases, last)    -> katalog bo'lagi; last=True da nusxa quriladi
+      ("event", MovieEvent)              -> delta
+      ("search", req_id, qn, limit, cut) -> ("ok"|"err", req_id, payload)
+      None                               -> chiqish
+    Bitta pipe bo'lgani uchun deltalar keyingi searchlardan oldin qo'llanadi.
+    """
+    index = CatalogIndex()
+    engine = ScoringEngine(workers=score_workers)
+    movies: list[dict] = []
+    aliases: list[dict] = []
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+
+        kind = msg[0]
+        if kind == "load":
+            movies.extend(msg[1])
+            aliases.extend(msg[2])
+            if msg[3]:
+                index.load(movies, aliases)
+                movies, aliases = [], []
+        elif kind == "event":
+            index.apply(msg[1])
+        elif kind == "search":
+            _, req_id, qn, limit, cutoff = msg
+            try:
+                conn.send(("ok", req_id, rank_local(index, engine, qn, limit, cutoff)))
+            except Exception as e:
+                conn.send(("err", req_id, repr(e)))
+
+
+# =========================
+# PARENT
+# =========================
+# snapshot shu hajmdagi bo'laklarda: pickle GIL'ni bo'shatmaydi, bitta katta
+# xabar executor thread'da ham event loop'ni uzoq to'xtatib qo'yadi
+LOAD_CHUNK = 5000
+
+class _Worker:
+    __slots__ = ("slot", "proc", "conn", "pending", "outbox", "writer")
+
+    def __init__(self, slot: int, proc, conn: Connection) -> None:
+        self.slot = slot
+        self.proc = proc
+        self.conn = conn
+        self.pending: dict[int, asyncio.Future] = {}
+        self.outbox: asyncio.Queue = asyncio.Queue()   # pipe'ga yoziladigan xabarlar (tartib bilan)
+        self.writer: asyncio.Task | None = None
+
+
+class ProcessSearchPool:
+    """
+    N ta worker process, har birida katalog nusxasi.
+    Deltalar db.movies change-feed orqali hammaga pipe'dan yuboriladi,
+    search so'rovlari esa eng kam band workerga shard qilinadi.
+    Pipe'ga yozish (pickle + send) executor thread'da -> katta snapshot ham
+    event loop'ni bloklamaydi. O'lgan worker backoff bilan qayta ishga tushadi.
+    """
+
+    RESPAWN_MAX_DELAY = 60
+
+    def __init__(self, processes: int, *, score_workers: int = 1) -> None:
+        self.processes = max(1, int(processes))
+        self.score_workers = score_workers
+        self._workers: list[_Worker] = []
+        self._ids = itertools.count(1)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ctx = None
+        self._fails: dict[int, int] = {}   # slot -> ketma-ket o'limlar (backoff uchun)
+        self._respawns: dict[int, asyncio.TimerHandle] = {}
+        self._stopped = False
+
+    @property
+    def alive(self) -> bool:
+        return any(w.proc.is_alive() for w in self._workers)
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._ctx = mp.get_context("spawn")  # parentdagi thread/pool holatini meros qilmasin
+        self._stopped = False
+        snapshot = CATALOG.snapshot()
+
+        for i in range(self.processes):
+            self._spawn(i, snapshot)
+
+        subscribe(self._on_event)
+        logger.info("Search process pool started: workers=%d movies=%d", self.processes, len(snapshot[0]))
+
+    def _spawn(self, slot: int, snapshot: tuple[list[dict], list[dict]]) -> None:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.score_workers),
+            name=f"search-worker-{slot}",
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+
+        w = _Worker(slot, proc, parent_conn)
+        # snapshot navbatda birinchi: keyingi deltalar undan keyin qo'llanadi
+        movies, aliases = snapshot
+        n = max(len(movies), len(aliases), 1)
+        for i in range(0, n, LOAD_CHUNK):
+            j = i + LOAD_CHUNK
+            w.outbox.put_nowait(("load", movies[i:j], aliases[i:j], j >= n))
+        w.writer = self._loop.create_task(self._write(w), name=f"search-writer-{slot}")
+        self._loop.add_reader(parent_conn.fileno(), self._on_readable, w)
+        self._workers.append(w)
+
+    def stop(self) -> None:
+        self._stopped = True
+        unsubscribe(self._on_event)
+        for h in self._respawns.values():
+            h.cancel()
+        self._respawns.clear()
+        for w in list(self._workers):
+            self._drop(w, RuntimeError("search pool stopped"))
+            try:
+                w.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            w.proc.join(timeout=5)
+        self._workers.clear()
+
+    async def _write(self, w: _Worker) -> None:
+        while True:
+            msg = await w.outbox.get()
+            try:
+                await self._loop.run_in_executor(None, w.conn.send, msg)
+            except (OSError, ValueError):
+                logger.error("search worker %s: pipe send failed", w.proc.name)
+                self._drop(w, RuntimeError("search worker died"))
+                return
+
+    def _on_event(self, event: MovieEvent) -> None:
+        for w in self._workers:
+            w.outbox.put_nowait(("event", event))
+
+    def _on_readable(self, w: _Worker) -> None:
+        try:
+            while w.conn.poll():
+                status, req_id, payload = w.conn.recv()
+                self._fails.pop(w.slot, None)  # javob berdi -> backoff qaytadan
+                fut = w.pending.pop(req_id, None)
+                if fut is None or fut.done():
+                    continue
+                if status == "ok":
+                    fut.set_result(payload)
+                else:
+                    fut.set_exception(RuntimeError(payload))
+        except (EOFError, OSError):
+            logger.error("search worker %s exited", w.proc.name)
+            self._drop(w, RuntimeError("search worker died"))
+
+    def _drop(self, w: _Worker, exc: Exception) -> None:
+        # reader'siz worker'ga boshqa so'rov yuborilmasin (javobini hech kim o'qimaydi)
+        if w not in self._workers:
+            return
+        self._workers.remove(w)
+        if self._loop is not None:
+            try:
+                self._loop.remove_reader(w.conn.fileno())
+            except (OSError, ValueError):
+                pass
+        if w.writer is not None and w.writer is not asyncio.current_task():
+            w.writer.cancel()
+        for fut in w.pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        w.pending.clear()
+
+        if not self._stopped:
+            if w.proc.is_alive():
+                w.proc.kill()  # pipe'i ishlamaydi, o'rniga yangisi keladi
+            self._schedule_respawn(w.slot)
+
+    def _schedule_respawn(self, slot: int) -> None:
+        fails = self._fails.get(slot, 0) + 1
+        self._fails[slot] = fails
+        delay = min(self.RESPAWN_MAX_DELAY, 2 ** fails)
+        logger.warning("search worker %d: respawn in %ss (fails=%d)", slot, delay, fails)
+        self._respawns[slot] = self._loop.call_later(delay, self._respawn, slot)
+
+    def _respawn(self, slot: int) -> None:
+        self._respawns.pop(slot, None)
+        if self._stopped:
+            return
+        try:
+            self._spawn(slot, CATALOG.snapshot())
+        except Exception:
+            logger.exception("search worker %d: respawn failed", slot)
+            self._schedule_respawn(slot)
+            return
+        logger.info("search worker %d respawned", slot)
+
+    async def search(self, qn: str, limit: int, score_cutoff: int, timeout: float = SEARCH_PROCESS_TIMEOUT):
+        """Javob timeout ichida kelmasa asyncio.TimeoutError (caller lokal qidiruvga o'tadi)."""
+        live = [w for w in self._workers if w.proc.is_alive()]
+        if not live:
+            raise RuntimeError("no live search workers")
+
+        w = min(live, key=lambda x: len(x.pending))
+        req_id = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        w.pending[req_id] = fut
+        w.outbox.put_nowait(("search", req_id, qn, limit, score_cutoff))
+
+        try:
+            short, ranked = await asyncio.wait_for(fut, timeout)
+        finally:
+            w.pending.pop(req_id, None)
+        out = []
+        for key, score in ranked:
+            e = CATALOG.get(*key)
+            if e is not None:  # parent/worker oralig'ida o'chirilgan bo'lishi mumkin
+                out.append((e, score))
+        return short, out
+
+
+POOL: ProcessSearchPool | None = None
+
+
+def start_search_pool(processes: int) -> ProcessSearchPool:
+    global POOL
+    if POOL is None:
+        POOL = ProcessSearchPool(processes)
+        POOL.start()
+    return POOL
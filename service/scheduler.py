@@ -0,0 +1,119 @@
+# service/scheduler.py
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from service.scoring import ScoreRequest, ScoringEngine
+
+logger = logging.getLogger(__name__)
+
+
+class SearchScheduler:
+    """
+    Micro-batching: max_wait ichida (yoki max_batch ta bo'lguncha) kelgan
+    querylarni yig'ib, bitta ScoringEngine.score_batch chaqiruvi bilan
+    alohida scoring threadida baholaydi. Har bir handler o'z future'ini oladi.
+
+      max_batch -> bitta batchdagi maksimal query soni
+      max_wait  -> birinchi querydan keyin qancha kutish (sekund)
+      max_queue -> navbat chuqurligi; to'lsa submit() kutadi (backpressure)
+    """
+
+    def __init__(
+        self,
+        engine: ScoringEngine,
+        *,
+        max_batch: int = 64,
+        max_wait: float = 0.005,
+        max_queue: int = 1024,
+    ) -> None:
+        self.engine = engine
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self.max_queue = max(1, int(max_queue))
+
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+        self.batches = 0
+        self.queries = 0
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-scoring")
+        self._task = asyncio.create_task(self._run(), name="search-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, req: ScoreRequest):
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((req, fut))
+        return await fut
+
+    async def _collect(self) -> list[tuple[ScoreRequest, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [(req, fut) for req, fut in batch if not fut.done()]  # cancel bo'lganlar
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.engine.score_batch, [req for req, _ in batch]
+                )
+            except asyncio.CancelledError:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.cancel()
+                raise
+            except Exception as e:
+                logger.exception("search batch failed: size=%d", len(batch))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
@@ -0,0 +1,114 @@
+# service/scoring.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from service.catalog import CatalogEntry
+
+
+@dataclass(slots=True)
+class ScoreRequest:
+    query: str                       # normalize() qilingan
+    candidates: Sequence[CatalogEntry]
+    limit: int = 30
+    score_cutoff: int = 70
+
+    @property
+    def scorer(self):
+        return fuzz.token_set_ratio if len(self.query.split()) > 1 else fuzz.QRatio
+
+
+def short_query_matches(qn: str, candidates: Sequence[CatalogEntry], limit: int) -> list[tuple[CatalogEntry, int]]:
+    """
+    Bitta qisqa token (< 4 belgi): fuzzy emas, exact / word-prefix bo'yicha.
+    Hech narsa topilmasa bo'sh ro'yxat (oxirgilarni qaytarmaymiz).
+    """
+    needle = qn.strip()
+    exact, word_prefix = [], []
+
+    for e in candidates:
+        tn = e.title_key
+        if tn == needle:
+            exact.append(e)
+        elif any(w == needle or w.startswith(needle) for w in tn.split()):
+            word_prefix.append(e)
+
+    return [(e, 100) for e in (exact + word_prefix)[:limit]]
+
+
+def is_short_query(qn: str) -> bool:
+    tokens = qn.split()
+    return len(tokens) == 1 and len(tokens[0]) < 4
+
+
+class ScoringEngine:
+    """
+    Ko'p querylarni bitta rapidfuzz.process.cdist chaqiruvida baholaydi.
+    Choices = CatalogEntry.title_key (startupda bir marta normalize qilingan),
+    top-k esa np.argpartition bilan olinadi.
+    """
+
+    def __init__(self, *, workers: int = -1) -> None:
+        self.workers = workers
+
+    def score(self, req: ScoreRequest) -> list[tuple[CatalogEntry, int]]:
+        return self.score_batch([req])[0]
+
+    def score_batch(self, reqs: Sequence[ScoreRequest]) -> list[list[tuple[CatalogEntry, int]]]:
+        out: list[list[tuple[CatalogEntry, int]]] = [[] for _ in reqs]
+
+        groups: dict[object, list[int]] = {}
+        for i, r in enumerate(reqs):
+            if r.candidates:
+                groups.setdefault(r.scorer, []).append(i)
+
+        for scorer, idxs in groups.items():
+            # kandidatlar birlashmasi -> bitta matritsa ustunlari
+            cols: dict[tuple[int, int], int] = {}
+            choices: list[str] = []
+            for i in idxs:
+                for e in reqs[i].candidates:
+                    if e.key not in cols:
+                        cols[e.key] = len(choices)
+                        choices.append(e.title_key)
+
+            matrix = process.cdist(
+                [reqs[i].query for i in idxs],
+                choices,
+                scorer=scorer,
+                score_cutoff=min(reqs[i].score_cutoff for i in idxs),
+                dtype=np.float32,
+                workers=self.workers,
+            )
+
+            for row, i in enumerate(idxs):
+                out[i] = _top_k(reqs[i], matrix[row], cols)
+
+        return out
+
+
+def _top_k(req: ScoreRequest, row: np.ndarray, cols: dict[tuple[int, int], int]):
+    n = len(req.candidates)
+    pos = np.fromiter((cols[e.key] for e in req.candidates), dtype=np.int64, count=n)
+    scores = row[pos]
+
+    keep = np.flatnonzero(scores >= req.score_cutoff)
+    if keep.size == 0:
+        return []
+
+    # process.extract kabi: score DESC, tenglikda kandidat tartibi saqlanadi
+    kept = scores[keep]
+    k = min(req.limit, keep.size)
+    if k < keep.size:
+        # k-chi eng katta score; chegaradagi tengliklar ham lexsort'ga kiradi
+        kth = kept[np.argpartition(-kept, k - 1)[k - 1]]
+        sel = np.flatnonzero(kept >= kth)
+    else:
+        sel = np.arange(keep.size)
+    order = sel[np.lexsort((keep[sel], -kept[sel]))][:k]
+
+    return [(req.candidates[keep[j]], int(kept[j])) for j in order]
@@ -1,166 +1,202 @@
 from __future__ import annotations
 
-import re
-import logging
 import asyncio
-from typing import Any
-
-from rapidfuzz import process, fuzz
-
-from db.movies import get_movies_like, get_movies_limit  # ✅ aniq moduldan
+import logging
+from array import array
+
+import asyncpg
+
+from config import (
+    SEARCH_BACKEND,
+    SCORE_WORKERS,
+    SEARCH_BATCH_MAX,
+    SEARCH_BATCH_WAIT_MS,
+    SEARCH_QUEUE_MAX,
+    RESULT_CACHE_SIZE,
+)
+from db.movies import catalog_version, get_movies_trgm
 from db.utils import normalize
+from service.catalog import CATALOG, CatalogEntry
+from service.scoring import ScoreRequest, ScoringEngine, is_short_query, short_query_matches
+from service.scheduler import SearchScheduler
+from service import procpool
+from utils.search_cache import ResultCache
+from utils.text import extract_episode, series_key  # noqa: F401 (eski importlar uchun)
 
 logger = logging.getLogger(__name__)
 
-EP_PATTERNS = [
-    re.compile(r"\b(?:qism|q|ep|episode|seriya|серия)\s*[-:#]?\s*(\d{1,4})\b", re.I),
-    re.compile(r"\bS(\d{1,2})\s*E(\d{1,4})\b", re.I),
-    re.compile(r"\b(\d{1,4})\s*[- ]?\s*(?:qism|q)\b", re.I),
-    re.compile(r"(?:^|\s)(\d{1,3})\s*$"),
-]
-
+ENGINE = ScoringEngine(workers=SCORE_WORKERS)
+SCHEDULER = SearchScheduler(
+    ENGINE,
+    max_batch=SEARCH_BATCH_MAX,
+    max_wait=SEARCH_BATCH_WAIT_MS / 1000,
+    max_queue=SEARCH_QUEUE_MAX,
+)
+RESULT_CACHE = ResultCache(maxsize=RESULT_CACHE_SIZE)
+
+# pg_trgm migratsiyasi yoki so'rovi ishlamasa xotiradagi katalog indeksiga o'tiladi
+_use_trgm = SEARCH_BACKEND == "pg_trgm"
+
+
+def trgm_enabled() -> bool:
+    return _use_trgm
+
+
+def disable_trgm(reason: str) -> None:
+    global _use_trgm
+    if _use_trgm:
+        logger.warning("pg_trgm search disabled (%s), using in-memory catalog index", reason)
+    _use_trgm = False
+
+
+def _as_item(e: CatalogEntry, score: float) -> dict:
+    return {
+        "id": e.id,
+        "title": e.title,
+        "message_id": e.message_id,
+        "channel_id": e.channel_id,
+        "score": int(score),
+    }
+
+
+async def _candidates(qn: str, limit: int) -> list[CatalogEntry]:
+    if not _use_trgm:
+        # ✅ DB emas, xotiradagi katalog indeksi
+        return CATALOG.like(qn, limit=limit)
+
+    # Postgres GIN trigram: bitta so'rov, similarity bo'yicha tartiblangan
+    try:
+        rows = await get_movies_trgm(qn, limit=limit)
+    except (asyncpg.UndefinedFunctionError, asyncpg.UndefinedObjectError) as e:
+        # extension / operator yo'q -> qayta urinishdan foyda yo'q
+        disable_trgm(type(e).__name__)
+        return CATALOG.like(qn, limit=limit)
+    except Exception:
+        logger.exception("pg_trgm search failed, catalog index fallback qn=%r", qn)
+        return CATALOG.like(qn, limit=limit)
+
+    out: list[CatalogEntry] = []
+    for r in rows:
+        e = CATALOG.get(r["channel_id"], r["message_id"])
+        if e is None:
+            e = CatalogEntry(
+                id=0,
+                channel_id=int(r["channel_id"]),
+                message_id=int(r["message_id"]),
+                title=r["title"] or "",
+                title_norm=normalize(r["title"]),
+                created_at=0,
+            )
+        out.append(e)
+    return out
+
+
+async def _rank_local(query: str, qn: str, limit: int, score_cutoff: int):
+    candidates = await _candidates(qn, limit=120)
+    logger.info("SEARCH candidates=%d", len(candidates))
 
-def extract_episode(title: str | None) -> tuple[int | None, int | None]:
-    t = (title or "").strip()
-    if not t:
-        return None, None
+    if not candidates:
+        if len(qn) < 4:
+            return False, []
+        candidates = CATALOG.latest(300)
+        logger.info("Fallback fuzzy used for query=%r rows=%d", query, len(candidates))
 
-    m = EP_PATTERNS[1].search(t)  # SxxExx
-    if m:
-        return int(m.group(1)), int(m.group(2))
+    # --- SHORT QUERY GUARD ---
+    if is_short_query(qn):
+        return True, short_query_matches(qn, candidates, limit)
 
-    for rx in (EP_PATTERNS[0], EP_PATTERNS[2], EP_PATTERNS[3]):
-        m = rx.search(t)
-        if m:
-            return None, int(m.group(1))
+    req = ScoreRequest(query=qn, candidates=candidates, limit=limit, score_cutoff=score_cutoff)
 
-    return None, None
+    # ✅ micro-batch: scoring alohida threadda, boshqa querylar bilan birga
+    return False, await SCHEDULER.submit(req)
 
 
-def series_key(title: str | None) -> str:
-    if not title:
-        return ""
-    tn = normalize(title).strip()
-    tn = re.sub(r"\b(s\d{1,2}e?\d{1,4}|e\d{1,4}|qism|q|ep|episode|seriya|серия|[sS]\d{1,2})\b", " ", tn, flags=re.I)
-    tn = re.sub(r"\b\d{1,4}\b", " ", tn)
-    tn = re.sub(r"[-:#×*.,!]+", " ", tn)
-    tn = re.sub(r"\s+", " ", tn).strip()
-    return tn
+async def rank_movies(query: str, limit: int = 30, score_cutoff: int = 70) -> list[tuple[CatalogEntry, int]]:
+    qn = normalize(query).strip()
+    if not qn:
+        return []
 
+    logger.info("SEARCH in: query=%r", query)
+    logger.info("SEARCH norm: qn=%r len=%d", qn, len(qn))
 
-def _row_title(row: Any) -> str:
-    if hasattr(row, "keys"):
-        return (row.get("title") or "")
-    if isinstance(row, (list, tuple)) and row:
-        return row[0] or ""
-    return ""
+    ranked = None
+    pool = procpool.POOL
+    if pool is not None and pool.alive and not _use_trgm:
+        # ✅ ko'p yadroli rejim: worker processlar (katalog nusxasi bilan)
+        try:
+            short, ranked = await pool.search(qn, limit, score_cutoff)
+        except asyncio.TimeoutError:
+            logger.warning("process pool search timed out, local fallback query=%r", query)
+            ranked = None
+        except Exception:
+            logger.exception("process pool search failed, local fallback query=%r", query)
+            ranked = None
 
+    if ranked is None:
+        short, ranked = await _rank_local(query, qn, limit, score_cutoff)
 
-def _row_mid(row: Any) -> int:
-    if hasattr(row, "keys"):
-        return int(row.get("message_id") or 0)
-    if isinstance(row, (list, tuple)) and len(row) > 1:
-        return int(row[1] or 0)
-    return 0
+    if short or not ranked:
+        return ranked
 
+    # serial sort: series_key/season/episode ingest paytida hisoblangan
+    qkey = series_key(query)
+    if qkey:
+        same_series = sum(1 for e, _ in ranked if e.series_key == qkey)
+        if same_series >= 3:
+            ranked.sort(key=lambda x: x[0].episode_order)
 
-def _row_cid(row: Any) -> int:
-    if hasattr(row, "keys"):
-        return int(row.get("channel_id") or 0)
-    if isinstance(row, (list, tuple)) and len(row) > 2:
-        return int(row[2] or 0)
-    return 0
+    return ranked
 
 
 async def find_top_movies(query: str, limit: int = 30, score_cutoff: int = 70) -> list[dict]:
-    qn = normalize(query).strip()
-    if not qn:
-        return []
+    return [_as_item(e, score) for e, score in await rank_movies(query, limit, score_cutoff)]
 
-    # ✅ DB async
-    candidates = await get_movies_like(qn, limit=120)
-    logger.info("SEARCH candidates=%d", len(candidates))
 
-    if not candidates:
-        if len(qn) < 4:
-            return []
-        candidates = await get_movies_limit(300)
-        logger.info("Fallback fuzzy used for query=%r", query)
-    if not candidates:
-        logger.warning("SEARCH db_like empty -> fallback_limit=300 query=%r qn=%r", query, qn)
-        candidates = await get_movies_limit(300)
-        logger.info("SEARCH fallback_limit: rows=%d", len(candidates))
+def items_by_ids(movie_ids) -> list[dict]:
+    """Saqlangan sessiya (movies.id lar) -> item'lar; katalogda yo'qlari tashlanadi."""
+    out = []
+    for mid in movie_ids:
+        e = CATALOG.by_id(mid)
+        if e is not None:
+            out.append(_as_item(e, 100))
+    return out
 
-    logger.info("SEARCH in: query=%r", query)
-    qn = normalize(query).strip()
-    logger.info("SEARCH norm: qn=%r len=%d", qn, len(qn))
-    tokens = qn.split()
-    logger.info("SEARCH tokens: %s", tokens)
 
-    # --- SHORT QUERY GUARD ---
-    if len(tokens) == 1 and len(tokens[0]) < 4:
-        needle = tokens[0]
-        exact, word_prefix = [], []
-
-        for row in candidates:
-            tn = normalize(_row_title(row)).strip()
-            words = tn.split()
-
-            if tn == needle:
-                exact.append(row)
-            elif any(w == needle or w.startswith(needle) for w in words):
-                word_prefix.append(row)
-
-        ordered = exact + word_prefix
-
-        # ✅ MUHIM: hech narsa topilmasa, oxirgilarni qaytarmaymiz
-        if not ordered:
-            return []
-
-        return [
-            {
-                "title": _row_title(row),
-                "message_id": _row_mid(row),
-                "channel_id": _row_cid(row),
-                "score": 100,
-            }
-            for row in ordered[:limit]
-        ]
-    titles = [_row_title(r) for r in candidates]
-    scorer = fuzz.token_set_ratio if len(tokens) > 1 else fuzz.QRatio
-
-    # ✅ CPU ishni threadga chiqaramiz (event loop bloklanmasin)
-    results = await asyncio.to_thread(
-        process.extract,
-        qn,
-        titles,
-        scorer=scorer,
-        limit=limit,
-        score_cutoff=score_cutoff,
-    )
-
-    out: list[dict] = []
-    for title, score, idx in results:
-        row = candidates[idx]
-        out.append(
-            {
-                "title": title,
-                "message_id": _row_mid(row),
-                "channel_id": _row_cid(row),
-                "score": int(score),
-            }
-        )
-
-    # serial sort
-    if out:
-        qkey = series_key(query)
-        if qkey:
-            same_series = [x for x in out if series_key(x["title"]) == qkey]
-            if len(same_series) >= 3:
-                def sort_key(x: dict):
-                    s, e = extract_episode(x["title"])
-                    return (s or 0, e if e is not None else 10**9, len(x["title"]))
-
-                out.sort(key=sort_key)
-
-    return out
\ No newline at end of file
+def find_episode(query: str, episode: int) -> dict | None:
+    """
+    "Title N" so'rovi: (series_key, episode) bo'yicha O(1) lookup, fuzzy'siz.
+    Topilmasa / noaniq bo'lsa None -> oddiy search_movies.
+    """
+    skey = series_key(query)
+    if not skey:
+        return None
+
+    e = CATALOG.find_episode(skey, episode)
+    return _as_item(e, 100) if e is not None else None
+
+
+async def search_movie_ids(query: str, episode: int | None = None) -> array:
+    """
+    find_top_movies + epizod bo'yicha tartib -> katalog row id lar (array('I')).
+    (normalize(query), episode) bo'yicha cache'langan va userlar orasida
+    bitta obyekt (o'zgartirmang). db.movies yozuvlari catalog_version'ni
+    oshiradi -> eski natija keyingi get'da o'zi tushib qoladi.
+    """
+    key = (normalize(query).strip(), episode)
+    version = catalog_version()
+
+    cached = RESULT_CACHE.get(key, version)
+    if cached is not None:
+        return cached
+
+    ranked = await rank_movies(query)
+    if ranked and episode is not None:
+        ranked.sort(key=lambda x: 0 if x[0].episode == episode else 1)
+
+    ids = array("I", (e.id for e, _ in ranked if e.id))
+    RESULT_CACHE.put(key, version, ids)
+    return ids
+
+
+async def search_movies(query: str, episode: int | None = None) -> list[dict]:
+    return items_by_ids(await search_movie_ids(query, episode))
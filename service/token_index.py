@@ -0,0 +1,189 @@
+# service/token_index.py
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left, insort
+from typing import Callable, Hashable
+
+# substring qidiruv uchun n-gram uzunligi (get_movies_like tokenlari >= 2 belgi)
+GRAM = 2
+
+
+def _words(norm: str) -> list[str]:
+    # LIKE '% tok%' semantikasi faqat bo'sh joy bilan ajratilgan so'zlarni ko'radi
+    return [w for w in (norm or "").split(" ") if w]
+
+
+class _Desc:
+    """Teskari tartib: heapq (min-heap) ustida max-heap uchun."""
+
+    __slots__ = ("v",)
+
+    def __init__(self, v) -> None:
+        self.v = v
+
+    def __lt__(self, other: "_Desc") -> bool:
+        return other.v < self.v
+
+
+def _grams(s: str) -> set[str]:
+    return {s[i:i + GRAM] for i in range(len(s) - GRAM + 1)}
+
+
+class TokenIndex:
+    """
+    Normalized matnlar bo'yicha inverted index.
+
+      _postings: so'z -> doc_id lar
+      _vocab:    tartiblangan so'zlar (prefix diapazoni uchun bisect)
+      _grams:    bigram -> so'zlar (substring uchun)
+
+    Har bir doc = (owner, norm); bitta owner (kino) ning title + aliaslari.
+    """
+
+    def __init__(self) -> None:
+        self._docs: dict[int, tuple[Hashable, str]] = {}
+        self._by_owner: dict[Hashable, list[int]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._vocab: list[str] = []
+        self._grams: dict[str, set[str]] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # -------- write --------
+    def add(self, owner: Hashable, norm: str) -> None:
+        doc_id = self._next_id
+        self._next_id += 1
+        self._docs[doc_id] = (owner, norm or "")
+        self._by_owner.setdefault(owner, []).append(doc_id)
+
+        for w in set(_words(norm)):
+            docs = self._postings.get(w)
+            if docs is None:
+                docs = self._postings[w] = set()
+                insort(self._vocab, w)
+                for g in _grams(w):
+                    self._grams.setdefault(g, set()).add(w)
+            docs.add(doc_id)
+
+    def remove_owner(self, owner: Hashable) -> None:
+        for doc_id in self._by_owner.pop(owner, ()):
+            _, norm = self._docs.pop(doc_id)
+            for w in set(_words(norm)):
+                docs = self._postings.get(w)
+                if docs is None:
+                    continue
+                docs.discard(doc_id)
+                if not docs:
+                    self._drop_word(w)
+
+    def _drop_word(self, w: str) -> None:
+        del self._postings[w]
+        i = bisect_left(self._vocab, w)
+        if i < len(self._vocab) and self._vocab[i] == w:
+            del self._vocab[i]
+        for g in _grams(w):
+            ws = self._grams.get(g)
+            if ws is not None:
+                ws.discard(w)
+                if not ws:
+                    del self._grams[g]
+
+    # -------- postings --------
+    def _prefix_words(self, t: str) -> list[str]:
+        vocab = self._vocab
+        i = j = bisect_left(vocab, t)
+        while j < len(vocab) and vocab[j].startswith(t):
+            j += 1
+        return vocab[i:j]
+
+    def _substring_words(self, t: str) -> list[str]:
+        grams = _grams(t)
+        if not grams:
+            return []
+        words: set[str] | None = None
+        for g in sorted(grams, key=lambda g: len(self._grams.get(g, ()))):
+            ws = self._grams.get(g)
+            if not ws:
+                return []
+            words = set(ws) if words is None else words & ws
+            if not words:
+                return []
+        return [w for w in words or () if t in w]
+
+    def _collect(
+        self,
+        words_per_token: list[list[str]],
+        match: Callable[[str], bool],
+        limit: int,
+    ) -> list[Hashable]:
+        """
+        Eng kichik posting'li token "driver": faqat uning doclari ko'riladi,
+        qolgan tokenlar doc matnida tekshiriladi (katta unionlar qurilmaydi).
+        Mos owner lardan eng kichik `limit` tasi bounded max-heap'da saqlanadi
+        (ORDER BY key LIMIT kabi, yuklanish tartibiga bog'liq emas); heap
+        to'lgach undan katta owner lar match qilinmaydi ham.
+        """
+        sizes = [sum(len(self._postings[w]) for w in ws) for ws in words_per_token]
+        if limit <= 0 or not sizes or not all(sizes):
+            return []
+
+        driver = words_per_token[sizes.index(min(sizes))]
+        heap: list[_Desc] = []
+        chosen: set[Hashable] = set()
+        for w in driver:
+            for d in self._postings[w]:
+                owner, norm = self._docs[d]
+                if owner in chosen:
+                    continue
+                full = len(heap) >= limit
+                if full and not owner < heap[0].v:
+                    continue
+                if not match(norm):
+                    continue
+                if full:
+                    chosen.discard(heapq.heapreplace(heap, _Desc(owner)).v)
+                else:
+                    heapq.heappush(heap, _Desc(owner))
+                chosen.add(owner)
+        return sorted(chosen)
+
+    # -------- query --------
+    def search(self, q: str, tokens: list[str], limit: int) -> tuple[int, list[Hashable]]:
+        """
+        get_movies_like tierlari, bitta docda hamma shart bajarilishi kerak:
+          1) (' '||norm||' ') LIKE '% q %'
+          2) har bir token: (' '||norm||' ') LIKE '% tok%'
+          3) har bir token: norm LIKE '%tok%'
+        Return: (tier, owners) — birinchi bo'sh bo'lmagan tierdan eng kichik
+        `limit` ta owner (o'sish tartibida); topilmasa (0, []).
+        """
+        phrase = f" {q} "
+        owners = self._collect(
+            [[w] if w in self._postings else [] for w in _words(q)],
+            lambda norm: phrase in f" {norm} ",
+            limit,
+        )
+        if owners:
+            return 1, owners
+
+        starts = [f" {t}" for t in tokens]
+        owners = self._collect(
+            [self._prefix_words(t) for t in tokens],
+            lambda norm: all(s in f" {norm}" for s in starts),
+            limit,
+        )
+        if owners:
+            return 2, owners
+
+        owners = self._collect(
+            [self._substring_words(t) for t in tokens],
+            lambda norm: all(t in norm for t in tokens),
+            limit,
+        )
+        if owners:
+            return 3, owners
+
+        return 0, []
@@ -0,0 +1,7 @@
+# tests/conftest.py
+import os
+import sys
+
+# config.py TOKEN bo'lmasa import paytida to'xtaydi
+os.environ.setdefault("TOKEN", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+# tests/test_broadcast.py
+import asyncio
+import time
+
+import service.broadcast as broadcast
+from service.broadcast import BlockedBuffer, TokenBucket
+
+
+def test_bucket_burst_then_rate():
+    async def main():
+        bucket = TokenBucket(rate=20, burst=5)
+        t0 = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        burst = time.monotonic() - t0
+        for _ in range(10):
+            await bucket.acquire()
+        return burst, time.monotonic() - t0
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.05
+    assert 0.45 <= total < 0.8  # 10 token / 20 per sekund
+
+
+def test_bucket_pause():
+    async def main():
+        bucket = TokenBucket(rate=100, burst=10)
+        bucket.pause(0.3)
+        t0 = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - t0
+
+    assert asyncio.run(main()) >= 0.3
+
+
+def test_bucket_fifo():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=1)
+        order = []
+
+        async def take(i):
+            await bucket.acquire()
+            order.append(i)
+
+        await asyncio.gather(*(take(i) for i in range(8)))
+        return order
+
+    assert asyncio.run(main()) == list(range(8))
+
+
+def _record_blocked(monkeypatch, fail=False):
+    calls = []
+
+    async def fake(ids):
+        calls.append(list(ids))
+        if fail:
+            raise RuntimeError("db down")
+
+    monkeypatch.setattr(broadcast, "set_users_blocked", fake)
+    return calls
+
+
+def test_blocked_buffer_flushes_at_max_ids(monkeypatch):
+    calls = _record_blocked(monkeypatch)
+
+    async def main():
+        buf = BlockedBuffer(max_ids=3, interval=60)
+        for uid in (1, 2, 3, 4):
+            await buf.add(uid)
+        pending = len(buf)
+        await buf.flush()
+        await buf.flush()  # bo'sh -> so'rov yo'q
+        return pending
+
+    assert asyncio.run(main()) == 1
+    assert calls == [[1, 2, 3], [4]]
+
+
+def test_blocked_buffer_flushes_after_interval(monkeypatch):
+    calls = _record_blocked(monkeypatch)
+
+    async def main():
+        buf = BlockedBuffer(max_ids=100, interval=0.1)
+        await buf.add(1)
+        await asyncio.sleep(0.15)
+        await buf.add(2)
+        return len(buf)
+
+    assert asyncio.run(main()) == 0
+    assert calls == [[1, 2]]
+
+
+def test_blocked_buffer_swallows_db_errors(monkeypatch):
+    calls = _record_blocked(monkeypatch, fail=True)
+
+    async def main():
+        buf = BlockedBuffer(max_ids=2)
+        await buf.add(1)
+        await buf.add(2)
+        return len(buf)
+
+    assert asyncio.run(main()) == 0
+    assert calls == [[1, 2]]
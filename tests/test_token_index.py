@@ -0,0 +1,65 @@
+# tests/test_token_index.py
+import random
+
+from service.token_index import TokenIndex
+
+
+def _like(docs, q, tokens, limit):
+    """get_movies_like tierlari (DISTINCT ON ... ORDER BY key LIMIT) — to'liq skan."""
+    tiers = [
+        lambda n: f" {q} " in f" {n} ",
+        lambda n: all(f" {t}" in f" {n}" for t in tokens),
+        lambda n: all(t in n for t in tokens),
+    ]
+    for tier, match in enumerate(tiers, 1):
+        owners = sorted({o for o, n in docs if match(n)})
+        if owners:
+            return tier, owners[:limit]
+    return 0, []
+
+
+def _docs(n=3000, seed=7):
+    rnd = random.Random(seed)
+    words = ["titanic", "avatar", "tun", "qora", "itlar", "tanic", "shahar", "1", "2", "3"]
+    docs = []
+    for i in range(n):
+        key = (rnd.randint(1, 3), rnd.randint(1, 100_000))
+        for _ in range(rnd.randint(1, 2)):
+            docs.append((key, " ".join(rnd.sample(words, rnd.randint(1, 3)))))
+    return docs
+
+
+QUERIES = ["titanic", "tun 1", "ti", "tanic ar", "qora itlar", "zz", "ahar 3"]
+
+
+def test_search_matches_full_scan():
+    docs = _docs()
+    idx = TokenIndex()
+    for owner, norm in docs:
+        idx.add(owner, norm)
+    for q in QUERIES:
+        tokens = [t for t in q.split() if len(t) >= 2]
+        assert idx.search(q, tokens, 20) == _like(docs, q, tokens, 20), q
+
+
+def test_search_independent_of_load_order():
+    docs = _docs()
+    shuffled = docs[:]
+    random.Random(1).shuffle(shuffled)
+    a, b = TokenIndex(), TokenIndex()
+    for owner, norm in docs:
+        a.add(owner, norm)
+    for owner, norm in shuffled:
+        b.add(owner, norm)
+    for q in QUERIES:
+        tokens = [t for t in q.split() if len(t) >= 2]
+        assert a.search(q, tokens, 5) == b.search(q, tokens, 5), q
+
+
+def test_search_after_remove():
+    idx = TokenIndex()
+    idx.add((1, 1), "titanic")
+    idx.add((1, 2), "titanic 2")
+    idx.remove_owner((1, 1))
+    assert idx.search("titanic", ["titanic"], 10) == (1, [(1, 2)])
+    assert idx.search("titanic", ["titanic"], 0) == (0, [])
@@ -0,0 +1,63 @@
+# tests/test_ttl.py
+import asyncio
+import time
+
+from utils.ttl import TimingWheel
+
+
+def test_fires_after_deadline():
+    async def main():
+        wheel = TimingWheel()
+        fired = []
+        t0 = time.time()
+        wheel.schedule(t0 + 1, lambda: fired.append(time.time()))
+        assert len(wheel) == 1
+        for _ in range(40):
+            if fired:
+                break
+            await asyncio.sleep(0.1)
+        await wheel.stop()
+        return t0, fired, len(wheel)
+
+    t0, fired, left = asyncio.run(main())
+    assert len(fired) == 1 and fired[0] >= t0 + 1
+    assert left == 0
+
+
+def test_cancel():
+    async def main():
+        wheel = TimingWheel()
+        fired = []
+        keep = wheel.schedule(time.time() + 1, lambda: fired.append("keep"))
+        drop = wheel.schedule(time.time() + 1, lambda: fired.append("drop"))
+        assert wheel.cancel(drop) and not wheel.cancel(drop)
+        assert len(wheel) == 1
+        await asyncio.sleep(2.2)
+        await wheel.stop()
+        return fired, keep.cancelled
+
+    fired, cancelled = asyncio.run(main())
+    assert fired == ["keep"] and not cancelled
+
+
+def test_cascade_order():
+    # loop task'siz: sekundlar qo'lda tick qilinadi (minut/soat/kun g'ildiraklari)
+    async def main():
+        wheel = TimingWheel()
+        fired = []
+        first = wheel.schedule(time.time() + 5, lambda: fired.append(5))
+        base = wheel._now
+        await wheel.stop()
+        wheel.cancel(first)
+
+        for delta in (90000, 4000, 61, 5, 3600):
+            wheel.schedule(base + delta, lambda d=delta: fired.append((d, wheel._now - base)))
+        await wheel.stop()
+
+        for s in range(base + 1, base + 90001):
+            wheel._tick(s)
+        return fired, len(wheel)
+
+    fired, left = asyncio.run(main())
+    assert fired == [(d, d) for d in (5, 61, 3600, 4000, 90000)]
+    assert left == 0
@@ -0,0 +1,123 @@
+# utils/access_cache.py
+from __future__ import annotations
+
+import heapq
+import time
+from collections import OrderedDict
+
+
+class AccessCache:
+    """
+    user_id -> expires_at (unix) cache, db.access.has_access oldida.
+
+      aktiv user   -> expires_at gacha cache'da (keyin o'zi eskiradi)
+      ruxsatsiz    -> neg_ttl sekund (boshqa process grant qilsa ham tez ko'rinsin)
+
+    grant/extend explicit invalidate qiladi. Hajm max_entries bilan (LRU) chegaralangan.
+    """
+
+    def __init__(self, *, max_entries: int = 100_000, neg_ttl: float = 30) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.neg_ttl = float(neg_ttl)
+        # user_id -> (expires_at, valid_until)
+        self._data: OrderedDict[int, tuple[int, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user_id: int) -> int | None:
+        """Cache'da bo'lsa expires_at (ruxsatsiz -> 0), aks holda None."""
+        entry = self._data.get(user_id)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._data[user_id]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, user_id: int, expires_at: int | None) -> None:
+        now = time.time()
+        exp = int(expires_at or 0)
+        valid_until = exp if exp > now else now + self.neg_ttl
+
+        self._data[user_id] = (exp, valid_until)
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(100 * self.hits / total) if total else 0,
+        }
+
+
+ACCESS_CACHE = AccessCache()
+
+
+class ActiveSubscribers:
+    """
+    Ixtiyoriy preload rejimi (ACCESS_PRELOAD=1): barcha aktiv (user_id, expires_at)
+    startupda xotiraga olinadi -> dict + expires_at bo'yicha min-heap.
+
+    Muddati o'tganlar heap'dan vaqt o'tishi bilan tashlanadi (lazy: heap'dagi
+    eskirgan juftlar dict bilan solishtirib o'tkazib yuboriladi).
+    grant/extend set() orqali yangilaydi. Faqat bitta bot processi uchun to'g'ri.
+    """
+
+    def __init__(self) -> None:
+        self._exp: dict[int, int] = {}
+        self._heap: list[tuple[int, int]] = []
+        self.loaded = False
+
+    def load(self, rows) -> None:
+        now = time.time()
+        self._exp = {int(uid): int(exp) for uid, exp in rows if int(exp) > now}
+        self._heap = [(exp, uid) for uid, exp in self._exp.items()]
+        heapq.heapify(self._heap)
+        self.loaded = True
+
+    def set(self, user_id: int, expires_at: int) -> None:
+        exp = int(expires_at)
+        if exp <= time.time():
+            self._exp.pop(user_id, None)
+            return
+        self._exp[user_id] = exp
+        heapq.heappush(self._heap, (exp, user_id))
+
+    def _expire(self) -> None:
+        now = time.time()
+        heap, exp_by_user = self._heap, self._exp
+        while heap and heap[0][0] <= now:
+            exp, uid = heapq.heappop(heap)
+            if exp_by_user.get(uid) == exp:
+                del exp_by_user[uid]
+
+    def expires_at(self, user_id: int) -> int:
+        self._expire()
+        return self._exp.get(user_id, 0)
+
+    def count(self) -> int:
+        self._expire()
+        return len(self._exp)
+
+    def user_ids(self) -> list[int]:
+        self._expire()
+        return list(self._exp)
+
+
+ACTIVE_SUBS = ActiveSubscribers()
@@ -1,9 +1,10 @@
 # utils/copy.py
 import asyncio
 import logging
+import time
 from aiogram.exceptions import TelegramBadRequest, TelegramAPIError
 
-from utils.ttl import delete_later
+from utils.ttl import DELETIONS, delete_later
 
 logger = logging.getLogger(__name__)
 
@@ -73,12 +74,16 @@ async def safe_copy_with_ttl(
             logger.exception("copy_message failed with TelegramAPIError (fallback path)")
             raise
 
-    # 3) TTL delete -> background task (MUHIM!)
+    # 3) TTL delete -> pending_deletions (restartdan keyin ham o'chiriladi)
     try:
-        asyncio.create_task(
-            delete_later(bot, chat_id, sent.message_id, seconds=ttl_sec)
-        )
+        await DELETIONS.schedule(chat_id, sent.message_id, time.time() + max(0, ttl_sec))
     except Exception:
-        logger.exception("delete_later scheduling failed (non-fatal)")
+        logger.exception("TTL persist failed, in-memory delete_later fallback")
+        try:
+            asyncio.create_task(
+                delete_later(bot, chat_id, sent.message_id, seconds=ttl_sec)
+            )
+        except Exception:
+            logger.exception("delete_later scheduling failed (non-fatal)")
 
     return True
\ No newline at end of file
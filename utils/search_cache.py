@@ -1,2 +1,279 @@
 # utils/search_cache.py
-SEARCH_CACHE: dict[str, dict] = {}
\ No newline at end of file
+from __future__ import annotations
+
+import heapq
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+def _sizeof(obj: Any, depth: int = 4) -> int:
+    """Taxminiy xotira hajmi (dict/list/tuple/str/array), chuqurlik cheklangan."""
+    size = sys.getsizeof(obj)
+    if depth <= 0 or isinstance(obj, (str, bytes, int, float, bool, array)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _sizeof(k, depth - 1) + _sizeof(v, depth - 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += _sizeof(v, depth - 1)
+    elif hasattr(obj, "__slots__"):
+        for name in obj.__slots__:
+            size += _sizeof(getattr(obj, name, None), depth - 1)
+    return size
+
+
+class SearchSession:
+    """
+    Kompakt pagination sessiyasi: faqat katalog row id lar (movies.id, array('I')).
+    Title/channel/message render paytida katalogdan olinadi; bir xil query
+    natijasi (ids) ResultCache orqali userlar orasida bitta obyekt.
+    O'chirilganlar tombstone (_removed) bilan belgilanadi: ids ko'chirilmaydi,
+    len / page() faqat tirik id lardan.
+    """
+
+    __slots__ = ("user_id", "ids", "_pos", "_removed", "_live", "checked")
+
+    def __init__(self, user_id: int, ids) -> None:
+        self.user_id = int(user_id)
+        self.ids = ids if isinstance(ids, array) else array("I", ids)
+        self._pos: dict[int, int] | None = None   # movie id -> pozitsiya (lazy)
+        self._removed: set[int] = set()
+        self._live = len(self.ids)
+        self.checked = -1   # oxirgi prune() paytidagi katalog holati (handler belgilaydi)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def position(self, movie_id: int) -> int | None:
+        """O(1): sessiyada (o'chirilmagan) bo'lsa ids dagi pozitsiyasi, aks holda None."""
+        if movie_id in self._removed:
+            return None
+        if self._pos is None:
+            self._pos = {mid: i for i, mid in enumerate(self.ids)}
+        return self._pos.get(movie_id)
+
+    def __contains__(self, movie_id: int) -> bool:
+        return self.position(movie_id) is not None
+
+    def live_index(self, movie_id: int) -> int | None:
+        """Tirik id lar ichidagi tartib raqami (sahifa uchun); O(o'chirilganlar soni)."""
+        i = self.position(movie_id)
+        if i is None:
+            return None
+        return i - sum(1 for mid in self._removed if self._pos[mid] < i)
+
+    def discard(self, movie_id: int) -> bool:
+        """O(1): tombstone qo'yiladi, ids (ResultCache bilan umumiy) o'zgarmaydi."""
+        if self.position(movie_id) is None:
+            return False
+        self._removed.add(movie_id)
+        self._live -= 1
+        return True
+
+    def prune(self, alive: Callable[[int], bool]) -> int:
+        """alive(id) False bo'lgan id larni discard qiladi; nechtasi tushganini qaytaradi."""
+        dead = [mid for mid in self.ids if mid not in self._removed and not alive(mid)]
+        self._removed.update(dead)
+        self._live -= len(dead)
+        return len(dead)
+
+    def page(self, start: int, end: int) -> list[int]:
+        """Tirik id lar bo'yicha [start:end) (tombstone'lar o'tkazib yuboriladi)."""
+        if not self._removed:
+            return self.ids[start:end].tolist()
+        removed = self._removed
+        return list(islice((mid for mid in self.ids if mid not in removed), start, end))
+
+
+class SessionStore:
+    """
+    Pagination sessiyalari uchun chegaralangan LRU + TTL store.
+
+      max_entries -> entrylar soni chegarasi
+      max_bytes   -> taxminiy umumiy xotira chegarasi
+      ttl         -> default yashash muddati (sekund), put(ttl=...) bilan alohida
+
+    get/put O(1) (heap push O(log n)); muddati o'tganlar expiry heap'dan
+    har bir chaqiruvda ozgina-ozgina tozalanadi, to'liq scan yo'q.
+    """
+
+    _EXPIRE_BATCH = 32
+
+    def __init__(self, *, max_entries: int = 20000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = float(ttl)
+
+        # key -> [value, expires_at, size, gen]
+        self._data: OrderedDict[Hashable, list] = OrderedDict()
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._bytes = 0
+        self._gen = 0
+
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: Hashable) -> Any:
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.put(key, value)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        self._expire(now)
+
+        slot = self._data.get(key)
+        if slot is None:
+            return default
+        if slot[1] <= now:
+            self._drop(key)
+            self.expired += 1
+            return default
+
+        self._data.move_to_end(key)
+        return slot[0]
+
+    def put(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        now = time.monotonic()
+        self._expire(now)
+
+        if key in self._data:
+            self._drop(key)
+
+        size = _sizeof(value)
+        expires_at = now + (self.ttl if ttl is None else float(ttl))
+        self._gen += 1
+        self._data[key] = [value, expires_at, size, self._gen]
+        self._bytes += size
+        heapq.heappush(self._heap, (expires_at, self._gen, key))
+
+        # LRU eviction: eng eski ishlatilganlar
+        while len(self._data) > 1 and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            old_key = next(iter(self._data))
+            self._drop(old_key)
+            self.evictions += 1
+
+        # lazy-deleted heap elementlari ko'payib ketmasin
+        if len(self._heap) > 2 * len(self._data) + 64:
+            self._heap = [(s[1], s[3], k) for k, s in self._data.items()]
+            heapq.heapify(self._heap)
+
+    def pop(self, key: Hashable, default: Any = _MISSING) -> Any:
+        slot = self._data.get(key)
+        if slot is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self._drop(key)
+        return slot[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._heap.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+    def _drop(self, key: Hashable) -> None:
+        slot = self._data.pop(key)
+        self._bytes -= slot[2]
+
+    def _expire(self, now: float) -> None:
+        heap = self._heap
+        n = 0
+        while heap and heap[0][0] <= now and n < self._EXPIRE_BATCH:
+            _, gen, key = heapq.heappop(heap)
+            n += 1
+            slot = self._data.get(key)
+            if slot is not None and slot[3] == gen:
+                self._drop(key)
+                self.expired += 1
+
+
+SEARCH_CACHE = SessionStore(ttl=10 * 60)
+
+
+class ResultCache:
+    """
+    Query natijalari uchun LRU cache.
+    Har bir entry katalog versiyasi bilan saqlanadi: versiya o'zgarsa
+    entry global clear'siz eskiradi (get paytida tashlanadi).
+    """
+
+    def __init__(self, maxsize: int = 2048) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self._data: OrderedDict[Hashable, tuple[int, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, version: int) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry[0] != version:
+            del self._data[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, version: int, value: Any) -> None:
+        self._data[key] = (version, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": round(100 * self.hits / total) if total else 0,
+        }
@@ -0,0 +1,70 @@
+# utils/text.py
+from __future__ import annotations
+
+import re
+
+EP_PATTERNS = [
+    re.compile(r"\b(?:qism|q|ep|episode|seriya|серия)\s*[-:#]?\s*(\d{1,4})\b", re.I),
+    re.compile(r"\bS(\d{1,2})\s*E(\d{1,4})\b", re.I),
+    re.compile(r"\b(\d{1,4})\s*[- ]?\s*(?:qism|q)\b", re.I),
+    re.compile(r"(?:^|\s)(\d{1,3})\s*$"),
+]
+
+_SERIES_MARKERS = re.compile(
+    r"\b(s\d{1,2}e?\d{1,4}|e\d{1,4}|qism|q|ep|episode|seriya|серия|[sS]\d{1,2})\b", re.I
+)
+_SERIES_NUMBERS = re.compile(r"\b\d{1,4}\b")
+_SERIES_PUNCT = re.compile(r"[-:#×*.,!]+")
+_WS = re.compile(r"\s+")
+_PUNCT = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize(s: str) -> str:
+    s = (s or "").lower()
+
+    # apostroflarni bir xil qilish
+    s = s.replace("’", "'").replace("`", "'").replace("ʻ", "'")
+
+    # kirill → lotin minimal mapping (kino bot uchun yetarli)
+    s = s.replace("ё", "e").replace("й", "i")
+
+    # punktuatsiyani space ga aylantiramiz
+    s = _PUNCT.sub(" ", s)
+
+    # space’larni tekislaymiz
+    s = _WS.sub(" ", s).strip()
+    return s
+
+
+def extract_episode(title: str | None) -> tuple[int | None, int | None]:
+    t = (title or "").strip()
+    if not t:
+        return None, None
+
+    m = EP_PATTERNS[1].search(t)  # SxxExx
+    if m:
+        return int(m.group(1)), int(m.group(2))
+
+    for rx in (EP_PATTERNS[0], EP_PATTERNS[2], EP_PATTERNS[3]):
+        m = rx.search(t)
+        if m:
+            return None, int(m.group(1))
+
+    return None, None
+
+
+def series_key(title: str | None) -> str:
+    if not title:
+        return ""
+    tn = normalize(title).strip()
+    tn = _SERIES_MARKERS.sub(" ", tn)
+    tn = _SERIES_NUMBERS.sub(" ", tn)
+    tn = _SERIES_PUNCT.sub(" ", tn)
+    tn = _WS.sub(" ", tn).strip()
+    return tn
+
+
+def series_info(title: str | None) -> tuple[str, int | None, int | None]:
+    """(series_key, season, episode) — ingest paytida bir marta hisoblanadi."""
+    season, episode = extract_episode(title)
+    return series_key(title), season, episode
@@ -1,7 +1,17 @@
 import asyncio
 import logging
+import os
+import socket
 import time
+import uuid
 from aiogram.exceptions import TelegramBadRequest, TelegramAPIError
+
+from db.deletions import (
+    add_pending_deletion,
+    claim_due_deletions,
+    remove_pending_deletions,
+    delay_pending_deletion,
+)
 try:
     from aiogram.exceptions import TelegramRetryAfter
 except Exception:  # ImportError yoki boshqa
@@ -23,16 +33,150 @@ def _is_soft_badrequest(e: TelegramBadRequest) -> bool:
     s = str(e).lower()
     return any(m in s for m in _SOFT_BADREQUEST_MARKERS)
 
-async def _sleep_chunked(total_seconds: int, *, chunk: int = 60) -> None:
+# =========================
+# TIMING WHEEL
+# =========================
+class TimerHandle:
+    __slots__ = ("deadline", "callback", "cancelled", "_bucket")
+
+    def __init__(self, deadline: int, callback) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self._bucket: set | None = None
+
+
+class TimingWheel:
     """
-    total_seconds ni bo'laklab uxlaydi.
-    Bu uzoq TTL'larda event loop cancel/restart signal'larini "yumshoq" qayta ishlashga yordam beradi.
+    Ierarxik timing wheel (1 sekund aniqlik): sekund (60) -> minut (60) -> soat (24)
+    g'ildiraklari + 1 kundan uzoqlar uchun overflow.
+
+      schedule(deadline, callback) -> TimerHandle   (O(1), deadline = unix time)
+      cancel(handle)                                (O(1))
+
+    Bitta loop task har sekundda faqat o'sha slotni ko'radi; minut/soat chegarasida
+    yuqori g'ildirak sloti pastga "cascade" qilinadi. Hech narsa bo'lmasa uxlaydi.
+    callback sync yoki coroutine function bo'lishi mumkin (coroutine -> task).
     """
-    remaining = int(total_seconds)
-    while remaining > 0:
-        step = min(chunk, remaining)
-        await asyncio.sleep(step)
-        remaining -= step
+
+    _LEVELS = ((1, 60), (60, 60), (3600, 24))  # (slot kengligi, slotlar soni)
+
+    def __init__(self) -> None:
+        self._wheels = [[set() for _ in range(n)] for _, n in self._LEVELS]
+        self._overflow: set[TimerHandle] = set()
+        self._now = int(time.time())   # oxirgi to'liq ishlangan sekund
+        self._size = 0
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="timing-wheel")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, deadline: float, callback) -> TimerHandle:
+        if self._size == 0:
+            # bo'sh turgan bo'lsa soat orqada qolgan; slotlar hozirgi vaqtdan hisoblansin
+            self._now = max(self._now, int(time.time()) - 1)
+        h = TimerHandle(int(deadline + 0.999), callback)  # ceil: erta ishlamasin
+        self._place(h)
+        self._size += 1
+        self.start()
+        self._wake.set()
+        return h
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        if handle.cancelled or handle._bucket is None:
+            return False
+        handle.cancelled = True
+        handle._bucket.discard(handle)
+        handle._bucket = None
+        self._size -= 1
+        return True
+
+    def _place(self, h: TimerHandle) -> None:
+        nxt = self._now + 1                  # keyingi ishlanadigan sekund
+        d = max(h.deadline, nxt)
+        delta = d - nxt
+        for (width, n), wheel in zip(self._LEVELS, self._wheels):
+            if delta < width * n:
+                bucket = wheel[(d // width) % n]
+                break
+        else:
+            bucket = self._overflow
+        bucket.add(h)
+        h._bucket = bucket
+
+    def _cascade(self, level: int, s: int) -> None:
+        width, n = self._LEVELS[level]
+        slot = (s // width) % n
+        items = self._wheels[level][slot]
+        self._wheels[level][slot] = set()
+        for h in items:
+            self._place(h)
+
+    def _tick(self, s: int) -> None:
+        # yuqoridan pastga: kun -> soat -> minut -> shu sekund
+        if s % 86400 == 0 and self._overflow:
+            items, self._overflow = self._overflow, set()
+            for h in items:
+                self._place(h)
+        if s % 3600 == 0:
+            self._cascade(2, s)
+        if s % 60 == 0:
+            self._cascade(1, s)
+
+        slot = s % 60
+        due = self._wheels[0][slot]
+        self._wheels[0][slot] = set()
+        self._now = s
+
+        for h in due:
+            h._bucket = None
+            self._size -= 1
+            self._fire(h)
+
+    def _fire(self, h: TimerHandle) -> None:
+        self.fired += 1
+        try:
+            res = h.callback()
+            if asyncio.iscoroutine(res):
+                asyncio.create_task(res)
+        except Exception:
+            logger.exception("timer callback failed")
+
+    async def _run(self) -> None:
+        while True:
+            if self._size == 0:
+                # bo'sh: schedule() uyg'otguncha uxlaymiz
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            now = int(time.time())
+            while self._now < now:
+                self._tick(self._now + 1)
+
+            await asyncio.sleep(max(0.0, self._now + 1 - time.time()))
+
+
+TIMERS = TimingWheel()
+
 
 async def delete_later(
     bot,
@@ -41,7 +185,6 @@ async def delete_later(
     seconds: int = 86400,
     *,
     max_delete_retries: int = 5,
-    sleep_chunk: int = 60,
 ) -> bool:
     """
     TTL bo'yicha xabar o'chiradi.
@@ -49,7 +192,8 @@ async def delete_later(
       True  -> delete success
       False -> delete qilinmadi (soft fail yoki retries tugadi)
 
-    Eslatma: bu runtime ichida mustahkam. Restart bo'lsa TTL yo'qoladi.
+    Eslatma: bu runtime ichida mustahkam. Restart bo'lsa TTL yo'qoladi
+    (mustahkam variant: DELETIONS). Kutish TIMERS (timing wheel) orqali.
     """
     if seconds < 0:
         seconds = 0
@@ -57,15 +201,13 @@ async def delete_later(
     due_at = time.time() + seconds
     logger.info("TTL scheduled: chat=%s msg=%s in %ss", chat_id, message_id, seconds)
 
-    # 1) deadline'ga yetguncha bo'laklab kutamiz
+    # 1) deadline'gacha bitta future kutadi (har minut uyg'onmaydi)
+    fut = asyncio.get_running_loop().create_future()
+    handle = TIMERS.schedule(due_at, lambda: fut.done() or fut.set_result(None))
     try:
-        while True:
-            now = time.time()
-            remaining = int(due_at - now)
-            if remaining <= 0:
-                break
-            await _sleep_chunked(remaining, chunk=sleep_chunk)
+        await fut
     except asyncio.CancelledError:
+        TIMERS.cancel(handle)
         logger.warning("TTL cancelled: chat=%s msg=%s", chat_id, message_id)
         return False
 
@@ -129,4 +271,257 @@ async def delete_later(
             continue
 
     logger.error("TTL delete failed after retries: chat=%s msg=%s", chat_id, message_id)
-    return False
\ No newline at end of file
+    return False
+
+
+# =========================
+# DURABLE SCHEDULER
+# =========================
+_OK, _SOFT, _RETRY = "ok", "soft", "retry"
+BATCH_DELETE_MAX = 100  # deleteMessages limiti
+
+
+async def _delete_batch(bot, chat_id: int, message_ids: list[int]) -> str:
+    """
+    Bitta chat uchun bitta urinish (1 ta bo'lsa deleteMessage, aks holda deleteMessages).
+    Return: _OK | _SOFT (o'chirib bo'lmaydi, tashlaymiz) | _RETRY.
+    TelegramRetryAfter tashqariga chiqadi (butun scheduler kutadi).
+    """
+    try:
+        if len(message_ids) == 1:
+            await bot.delete_message(chat_id=chat_id, message_id=message_ids[0])
+        else:
+            # topilmagan xabarlarni Telegram o'zi tashlab ketadi
+            await bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+        return _OK
+    except TelegramBadRequest as e:
+        if _is_soft_badrequest(e):
+            logger.info("TTL delete soft-fail: chat=%s msgs=%s err=%s", chat_id, len(message_ids), str(e))
+            return _SOFT
+        logger.warning("TTL delete badrequest: chat=%s msgs=%s err=%s", chat_id, len(message_ids), str(e))
+        return _RETRY
+    except Exception as e:
+        if TelegramRetryAfter is not None and isinstance(e, TelegramRetryAfter):
+            raise
+        if isinstance(e, TelegramAPIError):
+            logger.warning("TTL delete apierror: chat=%s msgs=%s err=%s", chat_id, len(message_ids), str(e))
+        else:
+            logger.exception("TTL delete unexpected error: chat=%s msgs=%s", chat_id, len(message_ids))
+        return _RETRY
+
+
+class DeletionScheduler:
+    """
+    Har bir xabar uchun task o'rniga bitta task:
+      - pending_deletions jadvali (chat_id, message_id, due_at) -> restartdan keyin ham saqlanadi
+      - keyingi `window` sekund ichidagilar TIMERS (timing wheel) da: har biri O(1)
+        schedule/cancel, due bo'lganda ready ro'yxatiga tushib task'ni uyg'otadi
+      - oyna har window/2 da due_at indeksi orqali to'ldiriladi; qatorlar
+        claim qilinadi (owner + lease_until, FOR UPDATE SKIP LOCKED) -> bir nechta
+        bot process bitta xabarni o'chirmaydi, process o'lsa due_at + lease_grace
+        dan keyin qatorni boshqasi oladi
+
+    Muddati o'tgan (bot o'chiq paytida) xabarlar startda darrov o'chiriladi.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: int = 300,
+        fetch_limit: int = 5000,
+        max_attempts: int = 5,
+        lease_grace: int = 120,
+    ) -> None:
+        self.window = max(10, int(window))
+        self.fetch_limit = max(1, int(fetch_limit))
+        self.max_attempts = max(1, int(max_attempts))
+        self.lease_grace = max(10, int(lease_grace))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._timers: dict[tuple[int, int], TimerHandle] = {}   # (chat_id, message_id) -> TIMERS handle
+        self._ready: list[tuple[int, int]] = []                  # due bo'lganlar (wheel callback)
+        self._horizon = 0        # shu vaqtgacha bo'lgan DB qatorlari xotirada
+        self._next_refill = 0.0
+        self._bot = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        self.deleted = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self) -> int:
+        return len(self._timers) + len(self._ready)
+
+    def start(self, bot) -> None:
+        if self.running:
+            return
+        self._bot = bot
+        self._wake = asyncio.Event()
+        self._next_refill = 0.0
+        self._task = asyncio.create_task(self._run(), name="ttl-deletions")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # claim qilinganlar lease_until dan keyin boshqa process'ga o'tadi
+        for h in self._timers.values():
+            TIMERS.cancel(h)
+        self._timers.clear()
+        self._ready.clear()
+
+    async def schedule(self, chat_id: int, message_id: int, due_at: float) -> None:
+        """Avval DBga yoziladi (xato bo'lsa exception), keyin oynada bo'lsa TIMERS'ga (claim bilan)."""
+        due = int(due_at)
+        local = self.running and due <= self._horizon
+        # oynadagi xabar shu process'da qoladi: darrov claim qilingan holda yoziladi
+        await add_pending_deletion(
+            chat_id=chat_id,
+            message_id=message_id,
+            due_at=due,
+            owner=self.owner if local else None,
+            lease_until=due + self.lease_grace if local else 0,
+        )
+        logger.info("TTL scheduled: chat=%s msg=%s due_at=%s", chat_id, message_id, due)
+
+        if local:
+            self._push(due, int(chat_id), int(message_id))
+
+    def _push(self, due: int, chat_id: int, message_id: int) -> None:
+        key = (chat_id, message_id)
+        if key in self._timers:
+            return
+        if due <= time.time():
+            # muddati o'tgan (restartdan oldingi / retry): wheel tick'ini kutmaydi
+            self._on_due(key)
+            return
+        self._timers[key] = TIMERS.schedule(due, lambda: self._on_due(key))
+
+    def _on_due(self, key: tuple[int, int]) -> None:
+        self._timers.pop(key, None)
+        self._ready.append(key)
+        self._wake.set()
+
+    async def _refill(self) -> None:
+        now = time.time()
+        until = int(now) + self.window
+        rows = await claim_due_deletions(
+            owner=self.owner,
+            until=until,
+            now=int(now),
+            grace=self.lease_grace,
+            limit=self.fetch_limit,
+        )
+        for r in rows:
+            self._push(r["due_at"], r["chat_id"], r["message_id"])
+
+        if len(rows) >= self.fetch_limit:
+            # limit to'ldi: faqat oxirgi due_at gacha to'liq yuklangan
+            self._horizon = rows[-1]["due_at"]
+            self._next_refill = min(now + self.window / 2, self._horizon)
+        else:
+            self._horizon = until
+            self._next_refill = now + self.window / 2
+
+    def _pop_due(self) -> dict[int, list[int]]:
+        """Muddati kelganlar (ready) olinadi va chat_id bo'yicha guruhlanadi."""
+        ready, self._ready = self._ready, []
+        groups: dict[int, list[int]] = {}
+        for chat_id, message_id in ready:
+            groups.setdefault(chat_id, []).append(message_id)
+        return groups
+
+    async def _delete_chunk(self, chat_id: int, ids: list[int]) -> str:
+        while True:
+            try:
+                return await _delete_batch(self._bot, chat_id, ids)
+            except Exception as e:  # TelegramRetryAfter
+                wait_for = int(getattr(e, "retry_after", 1)) + 1
+                logger.warning("TTL delete floodwait: retry_after=%ss", wait_for)
+                await asyncio.sleep(wait_for)
+
+    async def _process_due(self) -> None:
+        done: list[tuple[int, int]] = []
+        try:
+            for chat_id, ids in self._pop_due().items():
+                for i in range(0, len(ids), BATCH_DELETE_MAX):
+                    chunk = ids[i:i + BATCH_DELETE_MAX]
+                    outcome = await self._delete_chunk(chat_id, chunk)
+
+                    if outcome == _SOFT and len(chunk) > 1:
+                        # batch soft-fail: qaysi xabar ekanini bittalab aniqlaymiz
+                        for message_id in chunk:
+                            await self._settle(
+                                chat_id, [message_id],
+                                await self._delete_chunk(chat_id, [message_id]),
+                                done,
+                            )
+                        continue
+
+                    await self._settle(chat_id, chunk, outcome, done)
+        finally:
+            if done:
+                await remove_pending_deletions(done)
+
+    async def _settle(self, chat_id: int, ids: list[int], outcome: str, done: list) -> None:
+        if outcome == _OK:
+            logger.info("TTL deleted: chat=%s msgs=%s", chat_id, len(ids))
+            self.deleted += len(ids)
+            done.extend((chat_id, m) for m in ids)
+        elif outcome == _SOFT:
+            self.dropped += len(ids)
+            done.extend((chat_id, m) for m in ids)
+        else:
+            for message_id in ids:
+                await self._retry_later(chat_id, message_id, done)
+
+    async def _retry_later(self, chat_id: int, message_id: int, done: list) -> None:
+        attempts, due = await delay_pending_deletion(
+            chat_id=chat_id,
+            message_id=message_id,
+            now=int(time.time()),
+            owner=self.owner,
+            grace=self.lease_grace,
+        )
+        if attempts >= self.max_attempts:
+            logger.error("TTL delete failed after retries: chat=%s msg=%s", chat_id, message_id)
+            self.dropped += 1
+            done.append((chat_id, message_id))
+            return
+        if attempts and due <= self._horizon:
+            self._push(due, chat_id, message_id)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._process_due()
+                if time.time() >= self._next_refill:
+                    await self._refill()
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("TTL scheduler iteration failed")
+                await asyncio.sleep(5)
+                continue
+
+            if self._ready:
+                continue  # o'chirish paytida due bo'lganlar
+
+            # due vaqtlarini TIMERS kuzatadi: bu yerda faqat _on_due yoki refill kutiladi
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, self._next_refill - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+
+DELETIONS = DeletionScheduler()